@@ -1,16 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, constr
 import os
-import json
-import httpx
+import re
+import orjson
+import aiohttp
 import asyncio
-from datetime import datetime
+import time
 import logging
 from typing import Optional, Dict, List, Any, Union
+from contextlib import asynccontextmanager
+from collections import ChainMap
+from functools import lru_cache
+from types import MappingProxyType
 import uuid
 
 # Set up logging
@@ -23,47 +28,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger("frontdesk_api")
 
+# Format used for created_at/resolved_at timestamps shown on the dashboard
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _now_str():
+    """Current local time formatted for help request timestamps"""
+    return time.strftime(TIMESTAMP_FORMAT)
+
+# Input validation: surrounding whitespace is stripped and empty values are rejected
+NonEmptyStr = constr(strip_whitespace=True, min_length=1)
+
 # Define our models
 class CallRequest(BaseModel):
-    question: str
-    caller_info: str = "Unknown Caller"
-    
-    # Add input validation
-    @validator('question')
-    def question_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Question cannot be empty')
-        return v.strip()
-    
-    @validator('caller_info')
-    def caller_info_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Caller info cannot be empty')
-        return v.strip()
+    question: NonEmptyStr
+    caller_info: NonEmptyStr = "Unknown Caller"
 
 class ResolveRequest(BaseModel):
-    id: str
-    answer: str
-    
-    @validator('id')
-    def id_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Request ID cannot be empty')
-        return v.strip()
-    
-    @validator('answer')
-    def answer_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Answer cannot be empty')
-        return v.strip()
+    id: NonEmptyStr
+    answer: NonEmptyStr
 
 class HelpRequest:
+    __slots__ = ('id', 'question', 'caller_info', 'status', 'created_at', 'resolved_at', 'answer')
+    
     def __init__(self, question: str, caller_info: str):
-        self.id = str(uuid.uuid4())[:8]  # Shorter ID for human readability
+        self.id = uuid.uuid4().hex[:8]  # Shorter ID for human readability
         self.question = question.lower()  # Store in lowercase for easier matching
         self.caller_info = caller_info
         self.status = "Pending"
-        self.created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.created_at = _now_str()
         self.resolved_at = None
         self.answer = None
 
@@ -78,8 +70,45 @@ class HelpRequest:
             "answer": self.answer
         }
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown"""
+    # One pooled session for all notifications so connections are kept alive
+    app.state.http_session = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30),
+        json_serialize=lambda data: orjson.dumps(data).decode()
+    )
+    # Help request records are appended by a single background writer
+    app.state.save_queue = asyncio.Queue()
+    writer_task = asyncio.create_task(help_requests_writer(app.state.save_queue))
+    # Knowledge base saves share one temp file, so they run one at a time
+    app.state.knowledge_save_lock = asyncio.Lock()
+    yield
+    # Let the writer finish its current write and stop, so it never races the final flush
+    app.state.save_queue.put_nowait(STOP_WRITER)
+    await writer_task
+    # Give notifications still in flight a moment to finish before their session closes
+    if background_tasks:
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*background_tasks, return_exceptions=True),
+                NOTIFICATION_DRAIN_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {len(background_tasks)} notifications still in flight at shutdown")
+    await app.state.http_session.close()
+    # Write anything still queued, then leave a compact log behind
+    flush_pending_help_requests()
+    if help_requests_log_lines > len(help_requests):
+        save_help_requests(help_requests)
+
 # Create FastAPI app
-app = FastAPI(title="Frontdesk Assistant API")
+app = FastAPI(
+    title="Frontdesk Assistant API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # Configure CORS to allow all origins
 app.add_middleware(
@@ -108,20 +137,75 @@ knowledge_base = {
     "how much does a haircut cost?": "Haircuts start at $45 for short hair and $65 for long hair."
 }
 
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _norm(question):
+    """Normalize a question for matching: lowercase, no punctuation, single spaces"""
+    return _WHITESPACE_RE.sub(' ', _PUNCTUATION_RE.sub('', question.lower())).strip()
+
+# Static answers keyed by their normalized question
+_STATIC_KB = MappingProxyType({_norm(k): v for k, v in knowledge_base.items()})
+
 # In-memory storage (would be replaced by a database in production)
 help_requests = []
+# Help requests indexed by ID for O(1) lookups, kept in sync with help_requests
+help_requests_by_id = {}
+# IDs of pending help requests in creation order (a dict used as an ordered set)
+pending_request_ids = {}
+# Modification time of the help requests file when it was last loaded or saved
+help_requests_mtime = None
 
 # File paths for persistence
-HELP_REQUESTS_FILE = "help_requests.json"
+# Help requests are kept as an append-only log with one JSON record per line;
+# a later record for the same ID replaces the earlier one
+HELP_REQUESTS_FILE = "help_requests.jsonl"
+# Previous single-document format, migrated into the log on first load
+LEGACY_HELP_REQUESTS_FILE = "help_requests.json"
 KNOWLEDGE_BASE_FILE = "knowledge_base.json"
 
+# Write buffer size for persisted JSON files
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Number of records in the help requests log, including superseded ones
+help_requests_log_lines = 0
+
+# How long the background writer waits to batch updates before writing
+SAVE_DEBOUNCE_SECONDS = 0.2
+# Help requests waiting for the background writer, keyed by ID
+pending_help_request_writes = {}
+# Whether the background writer is currently appending to the log
+help_requests_write_in_flight = False
+# Put on the save queue to make the background writer stop after its last write
+STOP_WRITER = object()
+
 # Helper functions for data persistence
-def load_help_requests():
-    """Load help requests from file"""
-    if os.path.exists(HELP_REQUESTS_FILE):
+def write_bytes_atomic(path, data):
+    """Write bytes to a temp file and swap it into place"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_json_atomic(path, data):
+    """Write compact JSON to a temp file and swap it into place"""
+    write_bytes_atomic(path, orjson.dumps(data))
+
+def normalize_help_request(req):
+    """Fill in missing fields and canonicalize the status of a loaded request"""
+    if req.get('status', "pending").lower() == "pending":
+        req['status'] = "Pending"
+    if 'created_at' not in req:
+        req['created_at'] = _now_str()
+    if 'caller_info' not in req:
+        req['caller_info'] = "Unknown Caller"
+
+def load_legacy_help_requests():
+    """Load help requests from the old single-document JSON file"""
+    if os.path.exists(LEGACY_HELP_REQUESTS_FILE):
         try:
-            with open(HELP_REQUESTS_FILE, 'r') as f:
-                data = json.load(f)
+            with open(LEGACY_HELP_REQUESTS_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
                 
                 # Handle different formats
                 if isinstance(data, list):
@@ -138,47 +222,162 @@ def load_help_requests():
                             result.append(value)
                     return result
                 else:
-                    logger.error(f"Invalid data format in {HELP_REQUESTS_FILE}")
+                    logger.error(f"Invalid data format in {LEGACY_HELP_REQUESTS_FILE}")
                     return []
         except Exception as e:
-            logger.error(f"Error loading help requests: {e}")
+            logger.error(f"Error loading legacy help requests: {e}")
+    return []
+
+def load_help_requests():
+    """Load help requests by replaying the log file"""
+    global help_requests_log_lines
+    if not os.path.exists(HELP_REQUESTS_FILE):
+        requests = load_legacy_help_requests()
+        for req in requests:
+            normalize_help_request(req)
+        if requests:
+            logger.info(f"Migrating {len(requests)} help requests to {HELP_REQUESTS_FILE}")
+            save_help_requests(requests)
+        return requests
+    
+    try:
+        requests_by_id = {}
+        lines = 0
+        with open(HELP_REQUESTS_FILE, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    req = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning(f"Skipping unreadable line in {HELP_REQUESTS_FILE}")
+                    continue
+                if isinstance(req, dict) and 'id' in req:
+                    normalize_help_request(req)
+                    requests_by_id[req['id']] = req
+        help_requests_log_lines = lines
+        return list(requests_by_id.values())
+    except Exception as e:
+        logger.error(f"Error loading help requests: {e}")
     return []
 
 def save_help_requests(requests):
-    """Save help requests to file"""
+    """Rewrite the help requests log with one record per request"""
+    global help_requests_log_lines
     try:
-        # Ensure we're saving a list of dictionaries
-        valid_requests = []
-        for req in requests:
-            if isinstance(req, dict):
-                # Make a copy to avoid modifying the original
-                request_copy = req.copy()
-                
-                # Ensure required fields for dashboard
-                if 'status' not in request_copy:
-                    request_copy['status'] = "Pending"
-                elif request_copy['status'] == "pending":
-                    request_copy['status'] = "Pending"
-                
-                if 'created_at' not in request_copy:
-                    request_copy['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                valid_requests.append(request_copy)
-            else:
-                logger.warning(f"Skipping invalid request during save: {req}")
-        
-        with open(HELP_REQUESTS_FILE, 'w') as f:
-            json.dump(valid_requests, f, indent=4)
+        # Requests are normalized when created or loaded, so they are written as-is
+        write_bytes_atomic(HELP_REQUESTS_FILE, b''.join(orjson.dumps(req) + b'\n' for req in requests))
+        help_requests_log_lines = len(requests)
+        _remember_help_requests_mtime()
     except Exception as e:
         logger.error(f"Error saving help requests: {e}")
 
+def append_help_requests(requests):
+    """Append the current state of the given help requests to the log"""
+    global help_requests_log_lines
+    try:
+        with open(HELP_REQUESTS_FILE, 'ab') as f:
+            f.write(b''.join(orjson.dumps(req) + b'\n' for req in requests))
+        help_requests_log_lines += len(requests)
+        _remember_help_requests_mtime()
+    except Exception as e:
+        logger.error(f"Error appending help requests: {e}")
+        return
+    
+    # Compact once superseded records make up more than half of the log
+    if help_requests_log_lines > 2 * len(help_requests):
+        logger.info(f"Compacting {HELP_REQUESTS_FILE}")
+        save_help_requests(help_requests)
+
+def queue_help_request_save(request):
+    """Schedule a help request's current state to be appended by the background writer"""
+    pending_help_request_writes[request['id']] = request
+    app.state.save_queue.put_nowait(None)
+
+def take_pending_help_requests():
+    """Hand over the queued help requests, leaving a fresh dict for new updates"""
+    global pending_help_request_writes
+    requests = list(pending_help_request_writes.values())
+    pending_help_request_writes = {}
+    return requests
+
+def flush_pending_help_requests():
+    """Append every queued help request to the log on the calling thread"""
+    requests = take_pending_help_requests()
+    if requests:
+        append_help_requests(requests)
+
+async def help_requests_writer(queue):
+    """Coalesce bursts of help request updates into one log write off the event loop"""
+    global help_requests_write_in_flight
+    while True:
+        stop = await queue.get() is STOP_WRITER
+        # Let further updates from the same burst join this write
+        if not stop:
+            await asyncio.sleep(SAVE_DEBOUNCE_SECONDS)
+        while not queue.empty():
+            if queue.get_nowait() is STOP_WRITER:
+                stop = True
+        # The batch is swapped out here on the event loop, so the thread never shares a dict with it
+        requests = take_pending_help_requests()
+        if requests:
+            help_requests_write_in_flight = True
+            try:
+                await asyncio.to_thread(append_help_requests, requests)
+            except Exception as e:
+                logger.error(f"Error in help requests writer: {e}")
+            finally:
+                help_requests_write_in_flight = False
+        if stop:
+            return
+
+def _help_requests_file_mtime():
+    """Return the modification time of the help requests file, or None if missing"""
+    try:
+        return os.stat(HELP_REQUESTS_FILE).st_mtime
+    except OSError:
+        return None
+
+def _remember_help_requests_mtime():
+    """Record the file mtime matching the in-memory help requests"""
+    global help_requests_mtime
+    help_requests_mtime = _help_requests_file_mtime()
+
+def index_help_requests():
+    """Rebuild the ID and pending indexes from the in-memory help requests"""
+    global help_requests_by_id, pending_request_ids
+    help_requests_by_id = {}
+    pending_request_ids = {}
+    for req in help_requests:
+        if isinstance(req, dict) and 'id' in req:
+            help_requests_by_id[req['id']] = req
+            if req['status'] == "Pending":
+                pending_request_ids[req['id']] = None
+
+async def refresh_help_requests():
+    """Reload help requests only if the file was changed outside this process"""
+    global help_requests
+    # Our own unwritten updates would be lost by a reload
+    if pending_help_request_writes or help_requests_write_in_flight:
+        return
+    if _help_requests_file_mtime() != help_requests_mtime:
+        requests = await asyncio.to_thread(load_help_requests)
+        # Requests created while the file was being read are not in it yet
+        if pending_help_request_writes or help_requests_write_in_flight:
+            return
+        help_requests = requests
+        index_help_requests()
+        _remember_help_requests_mtime()
+        logger.info(f"Reloaded {len(help_requests)} help requests after external change")
+
 
 def load_dynamic_knowledge():
     """Load dynamic learned knowledge base"""
     if os.path.exists(KNOWLEDGE_BASE_FILE):
         try:
-            with open(KNOWLEDGE_BASE_FILE, 'r') as f:
-                return json.load(f)
+            with open(KNOWLEDGE_BASE_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         except Exception as e:
             logger.error(f"Error loading knowledge base: {e}")
     return {}
@@ -186,8 +385,7 @@ def load_dynamic_knowledge():
 def save_knowledge_base(knowledge):
     """Save dynamic learned knowledge base"""
     try:
-        with open(KNOWLEDGE_BASE_FILE, 'w') as f:
-            json.dump(knowledge, f, indent=4)
+        write_json_atomic(KNOWLEDGE_BASE_FILE, knowledge)
     except Exception as e:
         logger.error(f"Error saving knowledge base: {e}")
 
@@ -195,14 +393,12 @@ def save_knowledge_base(knowledge):
 async def send_notification(endpoint, data):
     """Send notification to the notification service"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{NOTIFICATION_SERVICE_URL}{endpoint}",
-                json=data,
-                timeout=10.0
-            )
-            if response.status_code != 200:
-                logger.error(f"Error sending notification: {response.status_code} - {response.text}")
+        async with app.state.http_session.post(
+            f"{NOTIFICATION_SERVICE_URL}{endpoint}",
+            json=data
+        ) as response:
+            if response.status != 200:
+                logger.error(f"Error sending notification: {response.status} - {await response.text()}")
                 return False
             logger.info(f"Notification sent successfully to {endpoint}")
             return True
@@ -210,10 +406,38 @@ async def send_notification(endpoint, data):
         logger.error(f"Exception sending notification: {e}")
         return False
 
+# Notifications still in flight; holding a reference keeps them from being garbage collected
+background_tasks = set()
+# How long shutdown waits for notifications still in flight
+NOTIFICATION_DRAIN_SECONDS = 5
+
+def notify_in_background(endpoint, data):
+    """Send a notification without making the caller wait for it"""
+    task = asyncio.create_task(send_notification(endpoint, data))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
 # Initialize data from files if they exist
 help_requests = load_help_requests()
+index_help_requests()
+_remember_help_requests_mtime()
 logger.info(f"Loaded {len(help_requests)} help requests from file")
 
+# Learned answers live in memory; the file is only written when they change
+dynamic_knowledge = load_dynamic_knowledge()
+logger.info(f"Loaded {len(dynamic_knowledge)} learned answers from file")
+
+# Learned answers keyed by their normalized question
+_learned_kb = {_norm(k): v for k, v in dynamic_knowledge.items()}
+
+# Single lookup across static answers first, then learned ones
+kb_chain = ChainMap(_STATIC_KB, _learned_kb)
+
+@lru_cache(maxsize=4096)
+def _lookup(question: str) -> Optional[str]:
+    """Find the known answer for a question; cleared whenever answers are learned"""
+    return kb_chain.get(_norm(question))
+
 # Custom exception handler for validation errors
 @app.exception_handler(422)
 async def validation_exception_handler(request: Request, exc: Any):
@@ -250,19 +474,12 @@ async def receive_call(request: CallRequest):
         logger.info(f"Received call from {caller_info} with question: '{question}'")
         
         # Extract room ID from caller_info (assuming format like "room-123")
-        room_id = caller_info.split("#")[0] if "#" in caller_info else caller_info
+        room_id = caller_info.partition("#")[0] or caller_info
         
-        # First check in static knowledge base
-        if question in knowledge_base:
-            response = knowledge_base[question]
-            logger.info(f"Responding from static knowledge base: {response}")
-            return {"response": response, "status": "answered"}
-        
-        # Then check in learned dynamic knowledge base
-        dynamic_knowledge = load_dynamic_knowledge()
-        if question in dynamic_knowledge:
-            response = dynamic_knowledge[question]
-            logger.info(f"Responding from learned knowledge base: {response}")
+        # Check the static and learned knowledge bases in one lookup
+        response = _lookup(question)
+        if response is not None:
+            logger.info(f"Responding from knowledge base: {response}")
             return {"response": response, "status": "answered"}
         
         # If not known → Escalate to supervisor
@@ -271,15 +488,18 @@ async def receive_call(request: CallRequest):
         # Create help request
         help_request = HelpRequest(question=question, caller_info=caller_info)
         
-        # Add to in-memory list
-        help_requests.append(help_request.to_dict())
+        # Add to in-memory list and index
+        request_data = help_request.to_dict()
+        help_requests.append(request_data)
+        help_requests_by_id[help_request.id] = request_data
+        pending_request_ids[help_request.id] = None
         
-        # Save to file
-        save_help_requests(help_requests)
+        # Append to the log file in the background
+        queue_help_request_save(request_data)
         logger.info(f"Created help request with ID: {help_request.id}")
         
         # Send notification to the notification service
-        await send_notification("/notify/request-created", {
+        notify_in_background("/notify/request-created", {
             "room_id": room_id,
             "request_id": help_request.id,
             "question": question,
@@ -306,31 +526,11 @@ async def receive_call(request: CallRequest):
 @app.get("/pending-requests")
 async def get_pending_requests():
     """Get all pending help requests for supervisor dashboard"""
-    # Reload from file to ensure we have the latest data
-    global help_requests
-    help_requests = load_help_requests()
+    # Pick up changes made to the file by other processes
+    await refresh_help_requests()
     
-    # Filter out any non-dictionary entries and get pending ones
-    valid_requests = []
-    for req in help_requests:
-        # Check if it's a dictionary and has a status field
-        if isinstance(req, dict) and 'status' in req:
-            # Convert lowercase "pending" to "Pending" if needed
-            if req['status'] == "pending":
-                req['status'] = "Pending"
-            
-            if req['status'] == "Pending":
-                # Make sure all required fields exist
-                if 'id' not in req:
-                    req['id'] = str(uuid.uuid4())[:8]
-                if 'created_at' not in req:
-                    req['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                if 'caller_info' not in req:
-                    req['caller_info'] = "Unknown Caller"
-                
-                valid_requests.append(req)
-        else:
-            logger.warning(f"Found invalid request: {req}")
+    # Requests are normalized on load, so the pending index is ready to serve
+    valid_requests = [help_requests_by_id[request_id] for request_id in pending_request_ids]
     
     logger.info(f"Returning {len(valid_requests)} pending requests")
     return valid_requests
@@ -338,9 +538,8 @@ async def get_pending_requests():
 @app.get("/all-requests")
 async def get_all_requests():
     """Get all help requests (pending and resolved)"""
-    # Reload from file to ensure we have the latest data
-    global help_requests
-    help_requests = load_help_requests()
+    # Pick up changes made to the file by other processes
+    await refresh_help_requests()
     
     # Filter out any non-dictionary entries
     valid_requests = [req for req in help_requests if isinstance(req, dict)]
@@ -356,60 +555,46 @@ async def resolve_request(request: ResolveRequest):
     
     logger.info(f"Resolving request {request_id} with answer: {answer}")
     
-    # Reload help requests to ensure we have the latest data
-    global help_requests
-    help_requests = load_help_requests()
+    # Pick up changes made to the file by other processes
+    await refresh_help_requests()
     
     updated = False
     resolved_question = None
     caller_info = None
     
     # Find and update the specific request
-    for req in help_requests:
-        if isinstance(req, dict) and 'id' in req and req['id'] == request_id:
-            # Check if status is pending (case-insensitive)
-            if req.get('status', '').lower() == "pending":
-                req['status'] = "Resolved"
-                req['resolved_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                req['answer'] = answer
-                resolved_question = req.get('question')
-                caller_info = req.get('caller_info', 'Unknown Caller')
-                updated = True
-                break
-    
-    # If not found in the list format, check if it's in dictionary format
-    if not updated:
-        # Try to find the request by ID directly (if help_requests is a dict)
-        if isinstance(help_requests, dict) and request_id in help_requests:
-            req = help_requests[request_id]
-            if req.get('status', '').lower() == "pending":
-                req['status'] = "Resolved"
-                req['resolved_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                req['answer'] = answer
-                resolved_question = req.get('question')
-                caller_info = req.get('caller_info', 'Unknown Caller')
-                # Add the ID to the dictionary if not present
-                if 'id' not in req:
-                    req['id'] = request_id
-                updated = True
+    req = help_requests_by_id.get(request_id)
+    # Check if status is pending (case-insensitive)
+    if req is not None and req.get('status', '').lower() == "pending":
+        req['status'] = "Resolved"
+        req['resolved_at'] = _now_str()
+        req['answer'] = answer
+        pending_request_ids.pop(request_id, None)
+        resolved_question = req.get('question')
+        caller_info = req.get('caller_info', 'Unknown Caller')
+        updated = True
     
     if updated:
-        # Save updated help requests
-        save_help_requests(help_requests)
+        # Record the resolved state in the log in the background
+        queue_help_request_save(req)
         logger.info(f"Request {request_id} has been resolved")
         
         # Add to dynamic knowledge base for future use
         if resolved_question:
-            dynamic_knowledge = load_dynamic_knowledge()
             dynamic_knowledge[resolved_question] = answer
-            save_knowledge_base(dynamic_knowledge)
+            _learned_kb[_norm(resolved_question)] = answer
+            _lookup.cache_clear()
+            # Save a snapshot, since other resolves may add answers while the thread writes
+            snapshot = dict(dynamic_knowledge)
+            async with app.state.knowledge_save_lock:
+                await asyncio.to_thread(save_knowledge_base, snapshot)
             logger.info(f"Added to knowledge base: '{resolved_question}': '{answer}'")
             
             # Extract room ID from caller_info
-            room_id = caller_info.split("#")[0] if "#" in caller_info else caller_info
+            room_id = caller_info.partition("#")[0] or caller_info
             
             # Send notification to the notification service
-            await send_notification("/notify/request-resolved", {
+            notify_in_background("/notify/request-resolved", {
                 "room_id": room_id,
                 "request_id": request_id,
                 "question": resolved_question,
@@ -428,21 +613,19 @@ async def resolve_request(request: ResolveRequest):
 @app.get("/learned-answers")
 async def get_learned_answers():
     """Get all learned answers for supervisor dashboard"""
-    dynamic_knowledge = load_dynamic_knowledge()
     logger.info(f"Returning {len(dynamic_knowledge)} learned answers")
     return dynamic_knowledge
 
 @app.get("/check-request/{request_id}")
 async def check_request_status(request_id: str):
     """Check the status of a specific request"""
-    # Reload help requests to ensure we have the latest data
-    global help_requests
-    help_requests = load_help_requests()
+    # Pick up changes made to the file by other processes
+    await refresh_help_requests()
     
-    for req in help_requests:
-        if req['id'] == request_id:
-            logger.info(f"Found request {request_id} with status {req['status']}")
-            return req
+    req = help_requests_by_id.get(request_id)
+    if req is not None:
+        logger.info(f"Found request {request_id} with status {req['status']}")
+        return req
     
     logger.warning(f"Request {request_id} not found")
     raise HTTPException(status_code=404, detail="Request not found")
@@ -452,19 +635,19 @@ async def get_request_status(request_id: str):
     """Get the status of a specific request for the agent to check"""
     logger.info(f"Checking status of request {request_id}")
     
-    for req in help_requests:
-        if req['id'] == request_id:
-            status = "resolved" if req['status'] == "Resolved" else "pending"
-            result = {
-                "status": status,
-                "request_id": req['id']
-            }
+    req = help_requests_by_id.get(request_id)
+    if req is not None:
+        status = "resolved" if req['status'] == "Resolved" else "pending"
+        result = {
+            "status": status,
+            "request_id": req['id']
+        }
+        
+        # Include answer if resolved
+        if status == "resolved":
+            result["answer"] = req['answer']
             
-            # Include answer if resolved
-            if status == "resolved":
-                result["answer"] = req['answer']
-                
-            return result
+        return result
     
     logger.warning(f"Request {request_id} not found")
     raise HTTPException(status_code=404, detail="Request not found")
@@ -479,41 +662,26 @@ async def clear_resolved_request(caller_id: str, request_id: str):
     
     # Find the request to confirm it exists and is resolved
     found = False
-    for req in help_requests:
-        if req['id'] == request_id and req['caller_info'] == caller_id:
-            if req['status'] == "Resolved":
-                found = True
-                # We could add additional tracking here if needed
-                # e.g., req['notified'] = True
-                logger.info(f"Confirmed request {request_id} was resolved and notification delivered")
-            else:
-                logger.warning(f"Request {request_id} is not in 'Resolved' state")
-                return {"success": False, "error": "Request is not in 'Resolved' state"}
+    req = help_requests_by_id.get(request_id)
+    if req is not None and req.get('caller_info') == caller_id:
+        if req['status'] == "Resolved":
+            found = True
+            # We could add additional tracking here if needed
+            # e.g., req['notified'] = True
+            logger.info(f"Confirmed request {request_id} was resolved and notification delivered")
+        else:
+            logger.warning(f"Request {request_id} is not in 'Resolved' state")
+            return {"success": False, "error": "Request is not in 'Resolved' state"}
     
     if not found:
         logger.warning(f"Request {request_id} for caller {caller_id} not found")
         return {"success": False, "error": "Request not found"}
     
-    # Save any updates we made to the help requests
-    save_help_requests(help_requests)
-    
     return {"success": True, "message": "Request acknowledged successfully"}
 
-# Serve the dashboard
-@app.get("/dashboard", response_class=HTMLResponse)
-async def get_dashboard():
-    """Return the dashboard HTML"""
-    try:
-        with open("static/index.html", "r") as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content)
-    except FileNotFoundError:
-        logger.error("Dashboard HTML file not found. Creating default index.html.")
-        # Write index.html to the static directory
-        with open("static/index.html", "w") as f:
-            # Write frontend HTML (you could include the HTML here)
-            with open("static/index.html", "w") as f:
-                f.write("""
+# Dashboard HTML location and the placeholder written when it is missing
+DASHBOARD_FILE = "static/index.html"
+DEFAULT_DASHBOARD_HTML = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -524,8 +692,27 @@ async def get_dashboard():
     <p>Redirecting to dashboard...</p>
 </body>
 </html>
-                """)
-        return HTMLResponse(content="<h1>Dashboard initialized. Please refresh the page.</h1>")
+"""
+
+def load_dashboard_html():
+    """Read the dashboard HTML, creating the default page if it does not exist"""
+    try:
+        with open(DASHBOARD_FILE, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.error("Dashboard HTML file not found. Creating default index.html.")
+        with open(DASHBOARD_FILE, "w") as f:
+            f.write(DEFAULT_DASHBOARD_HTML)
+        return DEFAULT_DASHBOARD_HTML.encode()
+
+# Dashboard HTML is read once and served from memory
+dashboard_html = load_dashboard_html()
+
+# Serve the dashboard
+@app.get("/dashboard", response_class=HTMLResponse)
+async def get_dashboard():
+    """Return the dashboard HTML"""
+    return HTMLResponse(content=dashboard_html)
 
 # Run the app
 if __name__ == "__main__":
@@ -533,26 +720,6 @@ if __name__ == "__main__":
     # Ensure the static directory exists
     os.makedirs("static", exist_ok=True)
     
-    # Create index.html if it doesn't exist yet
-    if not os.path.exists("static/index.html"):
-        logger.info("Creating initial index.html")
-        # Copy the dashboard HTML to the static directory
-        # This would be where you'd place the HTML from paste-4.txt
-        # Here we're just creating a simple redirect
-        with open("static/index.html", "w") as f:
-            f.write("""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Frontdesk AI Dashboard</title>
-    <meta http-equiv="refresh" content="0; url=/static/index.html">
-</head>
-<body>
-    <p>Redirecting to dashboard...</p>
-</body>
-</html>
-            """)
-    
     logger.info("Starting Frontdesk API server")
     # Start the server - binding to all interfaces (0.0.0.0)
     # to allow connections from other devices
@@ -1,7 +1,21 @@
 import uuid
-from datetime import datetime
+import time
 from typing import Optional, Dict, Any
 
+# Format used for created_at/resolved_at timestamps
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now_str() -> str:
+    """
+    Format the current local time for help request timestamps.
+    
+    Returns:
+        Timestamp string in TIMESTAMP_FORMAT
+    """
+    return time.strftime(TIMESTAMP_FORMAT)
+
+
 class HelpRequest:
     """
     Model representing a help request from an AI agent to a human supervisor.
@@ -16,6 +30,8 @@ class HelpRequest:
     - answer: The supervisor's answer (if resolved)
     """
     
+    __slots__ = ('id', 'question', 'caller_info', 'status', 'created_at', 'resolved_at', 'answer')
+    
     def __init__(self, question: str, caller_info: str):
         """
         Initialize a new help request.
@@ -24,11 +40,11 @@ class HelpRequest:
             question: The question that the AI couldn't answer
             caller_info: Information about the caller/customer
         """
-        self.id = str(uuid.uuid4())[:8]  # Generate a shorter ID for human readability
+        self.id = uuid.uuid4().hex[:8]  # Generate a shorter ID for human readability
         self.question = question.lower()  # Store in lowercase for easier matching
         self.caller_info = caller_info
         self.status = "Pending"
-        self.created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.created_at = _now_str()
         self.resolved_at = None
         self.answer = None
     
@@ -79,5 +95,5 @@ class HelpRequest:
             answer: The supervisor's answer to the question
         """
         self.status = "Resolved"
-        self.resolved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.resolved_at = _now_str()
         self.answer = answer
\ No newline at end of file
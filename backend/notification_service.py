@@ -1,11 +1,25 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Set
-import json
+from fastapi.responses import ORJSONResponse
+from starlette.websockets import WebSocketState
+from typing import Dict, Set
+import orjson
 import asyncio
+import time
+from collections import defaultdict, deque
 from datetime import datetime
 import logging
-from pydantic import BaseModel
+import os
+from dotenv import load_dotenv
+
+# Redis is only needed when several workers share notifications
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# Load environment variables
+load_dotenv()
 
 # Set up logging
 logging.basicConfig(
@@ -17,7 +31,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger("notification_service")
 
-app = FastAPI(title="Frontdesk Notification Service")
+# When set, notifications and pending requests are shared between workers through Redis
+REDIS_URL = os.getenv("REDIS_URL")
+# Channel and hash key prefixes used in Redis
+ROOM_CHANNEL_PREFIX = "room:"
+PENDING_KEY_PREFIX = "pending:"
+
+# Frames that never change are encoded once. Frames go out as text rather than
+# bytes because browsers deliver binary frames as Blobs, not strings
+PONG_FRAME = orjson.dumps({"type": "pong"}).decode()
+# Ping messages as sent by clients, matched before any JSON parsing
+PING_MESSAGES = frozenset({'{"type":"ping"}', '{"type": "ping"}'})
+
+app = FastAPI(title="Frontdesk Notification Service", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -29,17 +55,233 @@ app.add_middleware(
 )
 
 # Store active connections
-active_connections: Dict[str, List[WebSocket]] = {}
+active_connections: Dict[str, Set[WebSocket]] = defaultdict(set)
 # Store pending requests for each room
-pending_requests: Dict[str, Dict[str, Dict]] = {}
+pending_requests: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+
+# How long resolved requests are kept for replay to reconnecting clients
+RESOLVED_REQUEST_TTL_SECONDS = 3600
+# Maximum number of requests remembered per room; the oldest are dropped first
+MAX_PENDING_REQUESTS_PER_ROOM = 2048
+# (expiry time, room_id, request_id) for resolved requests, oldest first
+resolved_expiry: deque = deque()
+
+# Redis client, created on startup when REDIS_URL is set
+redis_client = None
+
+def remember_request(room_id: str, request_id: str, request_data: Dict):
+    """Store a request for a room, dropping the room's oldest entries beyond the limit"""
+    room_requests = pending_requests[room_id]
+    room_requests[request_id] = request_data
+    while len(room_requests) > MAX_PENDING_REQUESTS_PER_ROOM:
+        del room_requests[next(iter(room_requests))]
+
+def evict_expired_requests():
+    """Forget resolved requests older than the TTL and rooms left with no requests"""
+    now = time.monotonic()
+    # Bind the lookups used on every iteration once, outside the loop
+    expiry = resolved_expiry
+    popleft = expiry.popleft
+    rooms = pending_requests
+    get_room = rooms.get
+    while expiry and expiry[0][0] <= now:
+        _, room_id, request_id = popleft()
+        room_requests = get_room(room_id)
+        if room_requests is None:
+            continue
+        request_data = room_requests.get(request_id)
+        if request_data is not None and request_data.get("status") == "resolved":
+            del room_requests[request_id]
+        if not room_requests:
+            del rooms[room_id]
+
+# How long notifications are collected before being sent as one frame
+FLUSH_DELAY_SECONDS = 0.05
+# Maximum number of notifications sent in a single frame
+MAX_BATCH_SIZE = 128
+# Maximum number of notifications queued for one connection; a client that falls
+# further behind loses the oldest and gets stored requests replayed when it reconnects
+MAX_OUTBOX_SIZE = 1024
+
+# Tasks still running; holding a reference keeps them from being garbage collected
+background_tasks: Set[asyncio.Task] = set()
+
+def run_in_background(coro):
+    """Run a coroutine as a task without making the caller wait for it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Notifications waiting to be sent to each connection
+outboxes: Dict[WebSocket, deque] = {}
+# Connections that already have a flush scheduled
+scheduled_flushes: Set[WebSocket] = set()
+
+def enqueue(connection: WebSocket, message: Dict):
+    """Queue a notification for a connection, scheduling a flush if none is pending"""
+    outbox = outboxes.get(connection)
+    if outbox is None:
+        outbox = outboxes[connection] = deque(maxlen=MAX_OUTBOX_SIZE)
+    elif len(outbox) == MAX_OUTBOX_SIZE - 1:
+        # Warn once as it fills up, not for every notification dropped after that
+        logger.warning("Outbox full for a slow connection, its oldest notifications will be dropped")
+    outbox.append(message)
+    if connection not in scheduled_flushes:
+        scheduled_flushes.add(connection)
+        asyncio.get_running_loop().call_later(FLUSH_DELAY_SECONDS, start_flush, connection)
+
+def start_flush(connection: WebSocket):
+    """Timer callback that starts flushing a connection's outbox"""
+    run_in_background(flush(connection))
+
+async def flush(connection: WebSocket):
+    """Send a connection's queued notifications as JSON array frames"""
+    outbox = outboxes.get(connection)
+    try:
+        while outbox:
+            batch = [outbox.popleft() for _ in range(min(len(outbox), MAX_BATCH_SIZE))]
+            await send_message(connection, batch)
+    except Exception as e:
+        logger.error(f"Error flushing notifications: {e}")
+        outboxes.pop(connection, None)
+    finally:
+        scheduled_flushes.discard(connection)
+
+async def send_message(connection: WebSocket, message):
+    """Send a single message (or list of messages) encoded with orjson"""
+    await connection.send_text(orjson.dumps(message).decode())
+
+def discard_outbox(connection: WebSocket):
+    """Drop anything still queued for a closed connection"""
+    outboxes.pop(connection, None)
+
+def remove_connection(room_id: str, connection: WebSocket):
+    """Forget a closed connection and its queued notifications"""
+    discard_outbox(connection)
+    room_connections = active_connections.get(room_id)
+    if room_connections is not None:
+        room_connections.discard(connection)
+        if not room_connections:
+            del active_connections[room_id]
+
+def deliver_local(room_id: str, message: Dict) -> int:
+    """Queue a notification for this worker's connections in a room"""
+    delivered = 0
+    dead_connections = []
+    # Iterate over a snapshot; the set is only changed once the loop is done
+    for connection in tuple(active_connections.get(room_id, ())):
+        if connection.client_state == WebSocketState.DISCONNECTED:
+            dead_connections.append(connection)
+            continue
+        enqueue(connection, message)
+        delivered += 1
+    for connection in dead_connections:
+        remove_connection(room_id, connection)
+    return delivered
+
+async def broadcast(room_id: str, message: Dict) -> int:
+    """Send a notification to a room, through Redis when workers share state"""
+    if redis_client is None:
+        return deliver_local(room_id, message)
+    # The number of workers listening; each delivers to its own connections
+    return await redis_client.publish(f"{ROOM_CHANNEL_PREFIX}{room_id}", orjson.dumps(message))
+
+async def relay_published_notifications():
+    """Deliver notifications published by any worker to this worker's connections"""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{ROOM_CHANNEL_PREFIX}*")
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                room_id = message["channel"].decode()[len(ROOM_CHANNEL_PREFIX):]
+                deliver_local(room_id, orjson.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error relaying notifications from Redis: {e}")
+        finally:
+            # Return the subscription's connection before retrying or stopping
+            await pubsub.aclose()
+        await asyncio.sleep(1)
+
+async def share_request(room_id: str, request_id: str, request_data: Dict):
+    """Copy a stored request to Redis so other workers can replay it"""
+    if redis_client is None:
+        return
+    key = f"{PENDING_KEY_PREFIX}{room_id}"
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(key, request_id, orjson.dumps(request_data))
+        pipe.expire(key, RESOLVED_REQUEST_TTL_SECONDS)
+        await pipe.execute()
+
+async def room_requests_snapshot(room_id: str) -> Dict[str, Dict]:
+    """Requests known for a room, from Redis when workers share state"""
+    if redis_client is None:
+        return pending_requests.get(room_id, {})
+    stored = await redis_client.hgetall(f"{PENDING_KEY_PREFIX}{room_id}")
+    return {request_id.decode(): orjson.loads(data) for request_id, data in stored.items()}
+
+# How long a request_created notification is held back, so that a resolution
+# arriving right after it (e.g. a cached answer) is sent on its own. Only done
+# without Redis: the resolution may reach another worker, which cannot cancel the hold
+CREATE_COALESCE_SECONDS = 0.03
+# Held-back request_created notifications by (room_id, request_id)
+held_create_notifications: Dict[tuple, asyncio.TimerHandle] = {}
+
+def start_create_notification(room_id: str, request_id: str, room_message: Dict, dashboard_message: Dict):
+    """Timer callback that sends a held-back request_created notification"""
+    held_create_notifications.pop((room_id, request_id), None)
+    run_in_background(send_create_notification(room_id, request_id, room_message, dashboard_message))
+
+def has_listeners(room_id: str) -> bool:
+    """Whether a notification for this room could reach any connection"""
+    # With Redis, connections may be held by other workers
+    return redis_client is not None or room_id in active_connections or "dashboard" in active_connections
+
+async def send_create_notification(room_id: str, request_id: str, room_message: Dict, dashboard_message: Dict):
+    """Send request_created to the room that created the request and to the dashboard"""
+    try:
+        # First notify the room that created the request
+        room_sent = await broadcast(room_id, room_message)
+        # Then notify the dashboard
+        dashboard_sent = await broadcast("dashboard", dashboard_message)
+        if room_sent or dashboard_sent:
+            logger.info("Notification queued about request %s: room %s=%d, dashboard=%d", request_id, room_id, room_sent, dashboard_sent)
+    except Exception as e:
+        logger.error(f"Error sending request created notification: {e}")
+
+# Notification payload. A slotted class decoded with orjson keeps validation
+# off the pydantic path on the busiest endpoints
+class Notification:
+    __slots__ = ("room_id", "request_id", "question", "answer", "status")
+    
+    def __init__(self, room_id: str, request_id: str, question: str, status: str, answer: str = None):
+        self.room_id = room_id
+        self.request_id = request_id
+        self.question = question
+        self.status = status
+        self.answer = answer
 
-# Pydantic model for notification payloads
-class Notification(BaseModel):
-    room_id: str
-    request_id: str
-    question: str
-    answer: str = None
-    status: str
+NOTIFICATION_REQUIRED_FIELDS = ("room_id", "request_id", "question", "status")
+
+async def read_notification(request: Request) -> Notification:
+    """Decode and check a notification body, answering 422 if it is malformed"""
+    try:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Notification body must be valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="Notification body must be a JSON object")
+    for field in NOTIFICATION_REQUIRED_FIELDS:
+        if not isinstance(data.get(field), str):
+            raise HTTPException(status_code=422, detail=f"Field '{field}' must be a string")
+    answer = data.get("answer")
+    if answer is not None and not isinstance(answer, str):
+        raise HTTPException(status_code=422, detail="Field 'answer' must be a string")
+    return Notification(data["room_id"], data["request_id"], data["question"], data["status"], answer)
 
 @app.get("/")
 async def root():
@@ -53,181 +295,175 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     await websocket.accept()
     logger.info(f"WebSocket connection established for room: {room_id}")
     
-    # Initialize connection list for room if needed
-    if room_id not in active_connections:
-        active_connections[room_id] = []
-    
-    # Add this connection to the list
-    active_connections[room_id].append(websocket)
+    # Add this connection to the room's set
+    active_connections[room_id].add(websocket)
     
     try:
-        # Send any pending requests for this room
-        if room_id in pending_requests:
-            for request_id, request_data in pending_requests[room_id].items():
+        # Send any pending requests for this room, all in one frame
+        room_requests = await room_requests_snapshot(room_id)
+        if room_requests:
+            timestamp = datetime.now().isoformat()
+            replay = []
+            for request_id, request_data in room_requests.items():
                 if request_data.get("status") == "resolved":
-                    logger.info(f"Sending resolved request {request_id} to newly connected client in room {room_id}")
-                    await websocket.send_json({
+                    replay.append({
                         "type": "request_resolved",
                         "request_id": request_id,
                         "question": request_data.get("question"),
                         "answer": request_data.get("answer"),
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": timestamp
                     })
                 elif request_data.get("status") == "pending":
-                    logger.info(f"Sending pending request {request_id} to newly connected client in room {room_id}")
-                    await websocket.send_json({
+                    replay.append({
                         "type": "request_created",
                         "request_id": request_id,
                         "question": request_data.get("question"),
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": timestamp
                     })
+            if replay:
+                await send_message(websocket, replay)
+                logger.info("Replayed %d requests to newly connected client in room %s", len(replay), room_id)
         
         # Keep the connection alive and handle incoming messages
         while True:
             data = await websocket.receive_text()
+            # Heartbeats are by far the most common message, answer them without parsing
+            if data in PING_MESSAGES:
+                logger.debug("Received ping from %s, sending pong", room_id)
+                await websocket.send_text(PONG_FRAME)
+                continue
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
                 if message["type"] == "ping":
-                    logger.debug(f"Received ping from {room_id}, sending pong")
-                    await websocket.send_json({"type": "pong"})
-            except json.JSONDecodeError:
+                    logger.debug("Received ping from %s, sending pong", room_id)
+                    await websocket.send_text(PONG_FRAME)
+            except orjson.JSONDecodeError:
                 logger.warning(f"Non-JSON message received from {room_id}: {data}")
             except Exception as e:
                 logger.error(f"Error processing message from {room_id}: {e}")
     except WebSocketDisconnect:
         # Remove connection when disconnected
         logger.info(f"WebSocket disconnected for room: {room_id}")
-        active_connections[room_id].remove(websocket)
-        if not active_connections[room_id]:
-            del active_connections[room_id]
+        remove_connection(room_id, websocket)
     except Exception as e:
         logger.error(f"WebSocket error for {room_id}: {e}")
-        if room_id in active_connections and websocket in active_connections[room_id]:
-            active_connections[room_id].remove(websocket)
-            if not active_connections[room_id]:
-                del active_connections[room_id]
+        remove_connection(room_id, websocket)
 
 @app.post("/notify/request-created")
-async def notify_request_created(notification: Notification):
+async def notify_request_created(notification: Notification = Depends(read_notification)):
     """Notify that a new help request has been created"""
     room_id = notification.room_id
     request_id = notification.request_id
     question = notification.question
+    timestamp = datetime.now().isoformat()
     
-    logger.info(f"New help request created: {request_id} for room {room_id}, question: '{question}'")
+    logger.info("New help request created: %s for room %s, question: '%s'", request_id, room_id, question)
     
     # Store the pending request
-    if room_id not in pending_requests:
-        pending_requests[room_id] = {}
-    
-    pending_requests[room_id][request_id] = {
+    request_data = {
         "question": question,
         "status": "pending",
-        "created_at": datetime.now().isoformat()
+        "created_at": timestamp
     }
+    remember_request(room_id, request_id, request_data)
+    await share_request(room_id, request_id, request_data)
     
-    # Notify ALL connected clients about the new request (including dashboard)
-    notification_sent = False
-    
-    # First notify the room that created the request
-    if room_id in active_connections:
-        for connection in active_connections[room_id]:
-            try:
-                await connection.send_json({
-                    "type": "request_created",
-                    "request_id": request_id,
-                    "question": question,
-                    "timestamp": datetime.now().isoformat()
-                })
-                notification_sent = True
-                logger.info(f"Notification sent to room {room_id} about request {request_id}")
-            except Exception as e:
-                logger.error(f"Error sending notification to room {room_id}: {e}")
-    
-    # Then notify the dashboard
-    if "dashboard" in active_connections:
-        for connection in active_connections["dashboard"]:
-            try:
-                await connection.send_json({
-                    "type": "request_created",
-                    "request_id": request_id,
-                    "question": question,
-                    "room_id": room_id,
-                    "timestamp": datetime.now().isoformat()
-                })
-                notification_sent = True
-                logger.info(f"Notification sent to dashboard about request {request_id}")
-            except Exception as e:
-                logger.error(f"Error sending notification to dashboard: {e}")
+    # Nobody to notify; the request is replayed when a client connects
+    if not has_listeners(room_id):
+        return {"status": "ok", "message": "No active connections, notification stored"}
     
-    return {
-        "status": "ok", 
-        "message": "Request created notification sent" if notification_sent else "No active connections, notification stored"
+    # Notify ALL connected clients about the new request (including dashboard)
+    room_message = {
+        "type": "request_created",
+        "request_id": request_id,
+        "question": question,
+        "timestamp": timestamp
     }
+    dashboard_message = {
+        "type": "request_created",
+        "request_id": request_id,
+        "question": question,
+        "room_id": room_id,
+        "timestamp": timestamp
+    }
+    if redis_client is not None:
+        # Send right away, so it is published before any resolution from another worker
+        await send_create_notification(room_id, request_id, room_message, dashboard_message)
+    else:
+        # Hold it back in case the request is resolved within the coalescing window
+        held_create_notifications[(room_id, request_id)] = asyncio.get_running_loop().call_later(
+            CREATE_COALESCE_SECONDS,
+            start_create_notification,
+            room_id,
+            request_id,
+            room_message,
+            dashboard_message
+        )
+    
+    return {"status": "ok", "message": "Request created notification sent"}
 
 @app.post("/notify/request-resolved")
-async def notify_request_resolved(notification: Notification):
+async def notify_request_resolved(notification: Notification = Depends(read_notification)):
     """Notify that a help request has been resolved"""
     room_id = notification.room_id
     request_id = notification.request_id
     question = notification.question
     answer = notification.answer
+    timestamp = datetime.now().isoformat()
     
-    logger.info(f"Help request resolved: {request_id} for room {room_id}, answer: '{answer}'")
+    logger.info("Help request resolved: %s for room %s, answer: '%s'", request_id, room_id, answer)
     
     # Update the pending request
-    if room_id in pending_requests and request_id in pending_requests[room_id]:
-        pending_requests[room_id][request_id]["status"] = "resolved"
-        pending_requests[room_id][request_id]["answer"] = answer
-        pending_requests[room_id][request_id]["resolved_at"] = datetime.now().isoformat()
+    room_requests = pending_requests[room_id]
+    if request_id in room_requests:
+        room_requests[request_id]["status"] = "resolved"
+        room_requests[request_id]["answer"] = answer
+        room_requests[request_id]["resolved_at"] = timestamp
     else:
         # Create the request if it doesn't exist (might happen if notification service restarted)
-        if room_id not in pending_requests:
-            pending_requests[room_id] = {}
-        
-        pending_requests[room_id][request_id] = {
+        remember_request(room_id, request_id, {
             "question": question,
             "answer": answer,
             "status": "resolved",
-            "created_at": datetime.now().isoformat(),
-            "resolved_at": datetime.now().isoformat()
-        }
+            "created_at": timestamp,
+            "resolved_at": timestamp
+        })
+    resolved_expiry.append((time.monotonic() + RESOLVED_REQUEST_TTL_SECONDS, room_id, request_id))
+    await share_request(room_id, request_id, room_requests[request_id])
+    
+    # A request resolved right after it was created only needs the resolution sent
+    held_create = held_create_notifications.pop((room_id, request_id), None)
+    if held_create is not None:
+        held_create.cancel()
+        logger.debug("Dropped held-back created notification for request %s", request_id)
     
-    notification_sent = False
+    # Nobody to notify; the resolution is replayed when a client connects
+    if not has_listeners(room_id):
+        return {"status": "ok", "message": "No active connections for this room, notification stored"}
     
     # Notify the room and dashboard
     # First notify the room that created the request
-    if room_id in active_connections:
-        for connection in active_connections[room_id]:
-            try:
-                await connection.send_json({
-                    "type": "request_resolved",
-                    "request_id": request_id,
-                    "question": question,
-                    "answer": answer,
-                    "timestamp": datetime.now().isoformat()
-                })
-                notification_sent = True
-                logger.info(f"Resolution notification sent to room {room_id} about request {request_id}")
-            except Exception as e:
-                logger.error(f"Error sending resolution notification to room {room_id}: {e}")
+    room_sent = await broadcast(room_id, {
+        "type": "request_resolved",
+        "request_id": request_id,
+        "question": question,
+        "answer": answer,
+        "timestamp": timestamp
+    })
     
     # Then notify the dashboard
-    if "dashboard" in active_connections:
-        for connection in active_connections["dashboard"]:
-            try:
-                await connection.send_json({
-                    "type": "request_resolved",
-                    "request_id": request_id,
-                    "question": question,
-                    "answer": answer,
-                    "room_id": room_id,
-                    "timestamp": datetime.now().isoformat()
-                })
-                notification_sent = True
-                logger.info(f"Resolution notification sent to dashboard about request {request_id}")
-            except Exception as e:
-                logger.error(f"Error sending resolution notification to dashboard: {e}")
+    dashboard_sent = await broadcast("dashboard", {
+        "type": "request_resolved",
+        "request_id": request_id,
+        "question": question,
+        "answer": answer,
+        "room_id": room_id,
+        "timestamp": timestamp
+    })
+    
+    notification_sent = bool(room_sent or dashboard_sent)
+    if notification_sent:
+        logger.info("Resolution notification queued about request %s: room %s=%d, dashboard=%d", request_id, room_id, room_sent, dashboard_sent)
     
     return {
         "status": "ok", 
@@ -237,44 +473,61 @@ async def notify_request_resolved(notification: Notification):
 @app.get("/pending-requests/{room_id}")
 async def get_pending_requests(room_id: str):
     """Get all pending requests for a room"""
-    if room_id in pending_requests:
-        return pending_requests[room_id]
-    return {}
+    return await room_requests_snapshot(room_id)
 
 @app.delete("/clear-resolved/{room_id}/{request_id}")
 async def clear_resolved_request(room_id: str, request_id: str):
     """Clear a resolved request after it's been handled"""
+    cleared = False
     if room_id in pending_requests and request_id in pending_requests[room_id]:
         del pending_requests[room_id][request_id]
+        cleared = True
+    if redis_client is not None and await redis_client.hdel(f"{PENDING_KEY_PREFIX}{room_id}", request_id):
+        cleared = True
+    
+    if cleared:
         logger.info(f"Cleared request {request_id} for room {room_id}")
         return {"status": "ok", "message": "Request cleared"}
     
     raise HTTPException(status_code=404, detail="Request not found")
 
-# Background task to clean up inactive connections
+# Interval between protocol-level WebSocket pings, and how long to wait for the pong.
+# Dead connections are closed by the server and cleaned up in websocket_endpoint
+WS_PING_INTERVAL_SECONDS = 20
+WS_PING_TIMEOUT_SECONDS = 20
+
+# Long-running tasks started on startup and cancelled on shutdown
+service_tasks: Set[asyncio.Task] = set()
+
+# Background task to expire old requests
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(check_connections())
+    global redis_client
+    if REDIS_URL:
+        if aioredis is None:
+            raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+        redis_client = aioredis.from_url(REDIS_URL)
+        service_tasks.add(asyncio.create_task(relay_published_notifications()))
+        logger.info("Sharing notifications between workers through Redis")
+    service_tasks.add(asyncio.create_task(prune_pending_requests()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in service_tasks:
+        task.cancel()
+    await asyncio.gather(*service_tasks, return_exceptions=True)
+    service_tasks.clear()
+    if redis_client is not None:
+        await redis_client.aclose()
 
-async def check_connections():
-    """Periodically check connections and clean up inactive ones"""
+async def prune_pending_requests():
+    """Periodically drop resolved requests that have outlived their TTL"""
     while True:
         try:
-            # Send ping to all connections to keep them alive
-            for room_id, connections in list(active_connections.items()):
-                for conn in list(connections):
-                    try:
-                        await conn.send_json({"type": "ping"})
-                    except Exception:
-                        # Connection is closed, remove it
-                        if conn in active_connections[room_id]:
-                            active_connections[room_id].remove(conn)
-                        if not active_connections[room_id]:
-                            del active_connections[room_id]
-                            
+            evict_expired_requests()
             logger.debug(f"Active connections: {list(active_connections.keys())}")
         except Exception as e:
-            logger.error(f"Error checking connections: {e}")
+            logger.error(f"Error pruning pending requests: {e}")
         
         # Wait 30 seconds before next check
         await asyncio.sleep(30)
@@ -282,4 +535,18 @@ async def check_connections():
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting notification service")
-    uvicorn.run(app, host="0.0.0.0", port=5002)
\ No newline at end of file
+    # uvloop and httptools are used when installed (uvicorn[standard]).
+    # Keep WORKERS at 1 unless REDIS_URL is set: otherwise state lives in this process
+    uvicorn.run(
+        "notification_service:app",
+        host="0.0.0.0",
+        port=5002,
+        loop="auto",
+        http="httptools",
+        ws="websockets",
+        workers=int(os.getenv("WORKERS", "1")),
+        ws_ping_interval=WS_PING_INTERVAL_SECONDS,
+        ws_ping_timeout=WS_PING_TIMEOUT_SECONDS,
+        # Notification frames are small JSON, not worth compressing
+        ws_per_message_deflate=False
+    )
\ No newline at end of file
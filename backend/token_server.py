@@ -1,9 +1,12 @@
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
+import time
 from livekit import api
 
 # Load environment variables
@@ -14,7 +17,7 @@ LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
 LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
 
 # Create FastAPI app
-app = FastAPI(title="LiveKit Token Server")
+app = FastAPI(title="LiveKit Token Server", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -25,6 +28,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Signed tokens are reused for this many seconds before a fresh one is minted
+TOKEN_CACHE_WINDOW_SECONDS = 300
+# Maximum number of signed tokens kept; the oldest are dropped first
+MAX_CACHED_TOKENS = 4096
+# Signed tokens by (identity, name, room, can_publish, can_subscribe, window)
+signed_tokens = {}
+
+@lru_cache(maxsize=1024)
+def video_grants(room, can_publish, can_subscribe):
+    """Shared grants for a room; tokens only read them when signing"""
+    return api.VideoGrants(
+        room_join=True,
+        room=room,
+        can_publish=can_publish,
+        can_subscribe=can_subscribe,
+    )
+
+def build_token(identity, name, grants):
+    """Create an AccessToken signed with the server credentials"""
+    return api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
+        .with_identity(identity) \
+        .with_name(name) \
+        .with_grants(grants)
+
+def sign_token(identity, name, room, can_publish, can_subscribe):
+    """Sign a LiveKit token; runs in the threadpool so HMAC never blocks the event loop"""
+    return build_token(identity, name, video_grants(room, can_publish, can_subscribe)).to_jwt()
+
+async def mint_token(identity, name, room, can_publish=True, can_subscribe=True):
+    """Return a signed token, reusing the cached one for the current window"""
+    exp_bucket = int(time.time()) // TOKEN_CACHE_WINDOW_SECONDS
+    key = (identity, name, room, can_publish, can_subscribe, exp_bucket)
+    token = signed_tokens.get(key)
+    if token is None:
+        # Only cache misses pay for signing and the threadpool hop
+        token = await run_in_threadpool(sign_token, identity, name, room, can_publish, can_subscribe)
+        signed_tokens[key] = token
+        while len(signed_tokens) > MAX_CACHED_TOKENS:
+            del signed_tokens[next(iter(signed_tokens))]
+    return token
+
+@app.on_event("startup")
+async def check_credentials():
+    """Refuse to start without LiveKit credentials"""
+    if not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
+        raise RuntimeError(
+            "LiveKit credentials not configured. Please set LIVEKIT_API_KEY and LIVEKIT_API_SECRET environment variables."
+        )
+
 class TokenRequest(BaseModel):
     room_name: str
     participant_name: str
@@ -41,24 +93,12 @@ async def get_token(
     room: str = Query("my-room", description="Room name")
 ):
     """Get a LiveKit token with default parameters"""
-    if not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
-        raise HTTPException(
-            status_code=500, 
-            detail="LiveKit credentials not configured. Please set LIVEKIT_API_KEY and LIVEKIT_API_SECRET environment variables."
-        )
-    
     try:
         # Create the token based on LiveKit documentation example
-        token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
-            .with_identity(identity) \
-            .with_name(name) \
-            .with_grants(api.VideoGrants(
-                room_join=True,
-                room=room,
-            ))
+        token = await mint_token(identity, name, room)
         
         # Return the JWT token
-        return JSONResponse(content={"token": token.to_jwt()})
+        return {"token": token}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating token: {str(e)}")
@@ -66,30 +106,24 @@ async def get_token(
 @app.post("/create-token")
 async def create_token(request: TokenRequest):
     """Create a LiveKit token for a room and participant"""
-    if not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
-        raise HTTPException(
-            status_code=500, 
-            detail="LiveKit credentials not configured. Please set LIVEKIT_API_KEY and LIVEKIT_API_SECRET environment variables."
-        )
-    
     try:
         # Create the token using the same approach as getToken
-        token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
-            .with_identity(request.participant_name) \
-            .with_name(request.participant_name) \
-            .with_grants(api.VideoGrants(
-                room_join=True,
-                room=request.room_name,
-                can_publish=True,
-                can_subscribe=True,
-            ))
+        token = await mint_token(request.participant_name, request.participant_name, request.room_name)
         
         # Return the token
-        return {"token": token.to_jwt()}
+        return {"token": token}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating token: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=5001)
\ No newline at end of file
+    # uvloop and httptools are used when installed (uvicorn[standard])
+    uvicorn.run(
+        "token_server:app",
+        host="0.0.0.0",
+        port=5001,
+        loop="auto",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -1,7 +1,9 @@
-import json
+import orjson
 import logging
 import asyncio
+import aiohttp
 import websockets
+from websockets.asyncio.client import connect as websocket_connect
 from dotenv import load_dotenv
 
 from livekit import agents
@@ -10,6 +12,7 @@ from livekit.agents import (
     Agent, 
     RoomInputOptions,
     function_tool,
+    JobProcess,
     RunContext
 )
 from livekit.plugins import (
@@ -20,11 +23,27 @@ from livekit.plugins import (
 )
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 import os
-import requests
-import uuid
-from datetime import datetime
+import re
+import sys
+import heapq
+from collections import OrderedDict, deque
+from functools import lru_cache
 import time 
-from threading import Timer
+from threading import Lock
+
+# Job processes share the help request files; fcntl locks them where it exists (not on Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Run on uvloop when it is installed (it comes with uvicorn[standard] outside Windows).
+# The policy applies to the worker and to each job process, since both import this module
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -35,110 +54,436 @@ load_dotenv()
 
 # API and WebSocket endpoints
 API_URL = os.getenv("API_URL", "http://127.0.0.1:5000")
+CALL_URL = f"{API_URL}/call"
+# Headers for request bodies that are already encoded with orjson
+_JSON_HEADERS = {"Content-Type": "application/json"}
 NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://127.0.0.1:5002")
 WEBSOCKET_URL = os.getenv("WEBSOCKET_URL", "ws://127.0.0.1:5002/ws")
 
 # Path for help requests
 HELP_REQUESTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "help_requests.json")
 
-# Track recently asked questions to avoid duplicates
-recent_questions = {}
+# (second, formatted local date and time) for the second last formatted by _fast_isoformat
+_iso_second = (None, "")
+
+
+def _fast_isoformat():
+    """Local time in datetime.isoformat() form, formatting the date and time once per second"""
+    global _iso_second
+    now = time.time()
+    second = int(now)
+    cached = _iso_second
+    if cached[0] != second:
+        # Replace the whole tuple so threads never see a mismatched pair
+        cached = _iso_second = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second)))
+    return f"{cached[1]}.{int((now - second) * 1_000_000):06d}"
+
+# Help requests saved since the JSON file was last compacted, one JSON object per line
+HELP_REQUESTS_LOG_PATH = f"{HELP_REQUESTS_PATH}.log"
+# Rewrite the JSON file after this many appended requests
+COMPACT_EVERY_APPENDS = 50
+
+# Help requests by ID, and request IDs by lowercased question
+_requests_cache = {}
+_question_index = {}
+# Open handle on the log, and how many requests it holds
+_log_fh = None
+_appends_since_compaction = 0
+# The JSON file version and log offset last read into the cache, to pick up other processes' saves
+_json_version = None
+_log_offset = 0
+# Saves run in worker threads, so they take turns on the cache and log
+_save_lock = Lock()
+
+# Requests remembered per agent, and IDs of answers already spoken; the oldest are dropped first
+MAX_PENDING_REQUESTS = 1024
+MAX_HANDLED_REQUESTS = 1024
+
+# How long an escalated question blocks duplicate escalations
+ESCALATION_TTL_SECONDS = 300
+_NON_WORD = re.compile(r"\W+")
+
+
+# Keywords checked by _check_local_knowledge and the category each one signals
+_KEYWORD_CATEGORIES = {
+    "haircut": "haircut", "cut": "haircut", "trim": "haircut", "style": "haircut",
+    "price": "price", "cost": "price",
+    "women": "women", "men": "men",
+    "child": "child", "kid": "child",
+}
+# One alternation over every keyword, longest first, so a question is scanned once
+_KEYWORD_PATTERN = re.compile("|".join(sorted(map(re.escape, _KEYWORD_CATEGORIES), key=len, reverse=True)))
+
+# Canned answers for questions asked verbatim, checked before the keywords
+_EXACT_MATCHES: dict[str, str] = {
+    "do you have bridal makeup services": "Yes We have bridal makeup services",
+    "do you have spa services": "Yes, we provide a variety of spa treatments including massages and facials.",
+    "do you have hair dressing cutting services": "Yes, we offer professional hair cutting and styling services.",
+    "do you have party makeup": "Yes we provide party make up",
+    "do you offer hair bleaching": "Yes we offer different colors of hair bleaching",
+    "do you have makeup services": "Yes, we provide all kinds of makeup services from facial, tanning to every other makeup service",
+    "do you offer bridal makeup": "Yes we do offer bridal makeup",
+    "do you offer back or hair removal service in your salon": "Yes we do offer waxing and hair removal at our salon"
+}
+
+
+# Instructions given to the LLM for every room
+_SALON_INSTRUCTIONS = (
+    "You are a salon receptionist voice AI agent named Salon Assistant. Follow these guidelines:\n\n"
+    "1. IMMEDIATELY GREET CUSTOMERS when they join with a warm, friendly welcome.\n\n"
+    "2. NEVER use your own knowledge to answer questions about salon services, pricing, or appointments.\n\n"
+    "3. USE THE QUERY_KNOWLEDGE_BASE TOOL for ALL customer inquiries about:\n"
+    "   - Services (haircuts, coloring, styling, treatments)\n"
+    "   - Pricing information\n"
+    "   - Availability/appointments\n"
+    "   - Salon policies\n"
+    "   - Product recommendations\n"
+    "   - Bridal services\n"
+    "   - Spa services\n\n"
+    "4. IMMEDIATELY use the create_help_request tool when:\n"
+    "   - query_knowledge_base returns status 'escalated'\n"
+    "   - ANY questions about payments, especially international payments\n"
+    "   - Questions about currencies or payment methods\n"
+    "   - ANY question you don't have a direct answer for\n\n"
+    "5. When creating a help request:\n"
+    "   - Tell the customer you're checking with a supervisor\n"
+    "   - Provide the request ID and estimated response time\n"
+    "   - Reassure them that you'll notify them when you get an answer\n\n"
+    "6. When the customer SPECIFICALLY ASKS to check with a supervisor:\n"
+    "   - ALWAYS use the CREATE_HELP_REQUEST tool to submit their question\n"
+    "   - Tell them you've sent their question to the supervisor\n"
+    "   - Provide a request ID and estimated response time\n\n"
+    "7. Maintain a NATURAL CONVERSATIONAL TONE:\n"
+    "   - Be attentive and responsive\n"
+    "   - Avoid robotic-sounding phrases\n"
+    "   - Use casual, friendly language\n"
+    "   - Acknowledge and validate customer concerns\n\n"
+    "IMPORTANT: ALWAYS KEEP THE CONVERSATION GOING. If you don't know an answer, apologize, "
+    "explain you need to check with a supervisor, and suggest they can ask about other topics.\n\n"
+    "CRITICAL: For payment-related questions about international payments, credit cards, currencies, etc., "
+    "ALWAYS use query_knowledge_base and then create_help_request in sequence. NEVER skip creating a help request."
+)
+
+
+# Largest notification frame accepted from the notification service
+WS_MAX_FRAME_BYTES = 2 ** 20
+
+# Upper bound on a single attempt to speak a resolved answer
+SPEAK_TIMEOUT_SECONDS = 30
+
+# Messages spoken or returned to the user, filled in with format_map
+_RESOLVED_ANSWER_MESSAGE = (
+    "I just received an answer to your question about {question}. "
+    "The answer is: {answer} "
+    "Is there anything else you'd like to know about our salon services?"
+)
+# Ways to speak a resolved answer, tried in order until one succeeds:
+# (pause before the attempt in seconds, SalonAssistant method, message template)
+_SPEAK_STRATEGIES = (
+    (0, "_say", _RESOLVED_ANSWER_MESSAGE),
+    # Shorter message to reduce the chance of TTS issues
+    (2, "_reply", "About your question on {question}: {answer}"),
+    (3, "_say_in_chunks", "Regarding {question}, the answer is: {answer}"),
+    # The most basic message possible
+    (4, "_say", "The answer to your question is: {answer}"),
+)
+_ESCALATED_MESSAGE = (
+    "I've sent your question about {question} to my supervisor. "
+    "Your request ID is {request_id}. They usually respond within 5-10 minutes. "
+    "I'll let you know as soon as I hear back. "
+    "Is there anything else I can help you with in the meantime?"
+)
+_ALREADY_ESCALATED_MESSAGE = (
+    "I've already sent your question about {question} to my supervisor. "
+    "They usually respond within 5-10 minutes. "
+    "I'll let you know as soon as I hear back. "
+    "Is there anything else I can help you with in the meantime?"
+)
+_UNKNOWN_QUESTION_MESSAGE = (
+    "I don't have information about {question} in my knowledge base yet. "
+    "I'd need to check with my supervisor about this specific question. "
+    "In the meantime, is there anything else I can help you with about our services, "
+    "pricing, or appointment availability?"
+)
+
+
+# Request IDs are cut from one os.urandom call, this many at a time
+REQUEST_ID_BATCH_SIZE = 8
+_request_id_pool = deque()
+
+
+def _next_request_id():
+    """Return a random 8-hex-character request ID, refilling the pool when it runs out"""
+    if not _request_id_pool:
+        raw = os.urandom(4 * REQUEST_ID_BATCH_SIZE).hex()
+        _request_id_pool.extend(raw[i:i + 8] for i in range(0, len(raw), 8))
+    return _request_id_pool.popleft()
+
+
+@lru_cache(maxsize=2048)
+def _canon(question):
+    """Canonical form of a question for dedupe: lowercased, whitespace collapsed, interned"""
+    return sys.intern(" ".join(question.lower().split()))
+
+
+@lru_cache(maxsize=2048)
+def _escalation_key(question):
+    """Canonical question with punctuation reduced to single spaces as well"""
+    return _NON_WORD.sub(" ", _canon(question)).strip()
+
+
+def _shingles(key):
+    """Three-word shingles of an escalation key; shorter keys are a single shingle"""
+    words = key.split()
+    if len(words) < 3:
+        return frozenset([tuple(words)])
+    return frozenset(zip(words, words[1:], words[2:]))
+
+
+def _file_version(path):
+    """Identify the current contents of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _merge_help_requests(entries):
+    """Add saved requests to the cache and question index, skipping anything that is not a request"""
+    if not isinstance(entries, dict):
+        logger.warning("Skipping help request data that is not a JSON object")
+        return
+    for req_id, req_data in entries.items():
+        if not isinstance(req_data, dict):
+            logger.warning(f"Skipping malformed help request {req_id}")
+            continue
+        _requests_cache[req_id] = req_data
+        # The first request saved for a question wins, as the old linear scan did
+        _question_index.setdefault(_canon(req_data.get("question", "")), req_id)
+
+
+def _read_help_request_log(offset):
+    """Merge log lines from offset into the cache and return the offset of the end of the log"""
+    global _appends_since_compaction
+    try:
+        with open(HELP_REQUESTS_LOG_PATH, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning("Skipping incomplete line in help request log")
+                    continue
+                _merge_help_requests(entries)
+                _appends_since_compaction += 1
+            return f.tell()
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        logger.warning(f"Could not read {HELP_REQUESTS_LOG_PATH}: {e}")
+        return offset
+
+
+def _load_help_requests():
+    """Load the JSON file and any requests appended to the log since it was last compacted"""
+    global _appends_since_compaction, _json_version, _log_offset
+    _requests_cache.clear()
+    _question_index.clear()
+    _appends_since_compaction = 0
+    _json_version = _file_version(HELP_REQUESTS_PATH)
+    
+    try:
+        with open(HELP_REQUESTS_PATH, 'rb') as f:
+            existing_requests = orjson.loads(f.read())
+        _merge_help_requests(existing_requests)
+    except FileNotFoundError:
+        pass
+    except orjson.JSONDecodeError as e:
+        logger.warning(f"Could not parse {HELP_REQUESTS_PATH}, starting empty: {e}")
+    except OSError as e:
+        logger.warning(f"Could not read {HELP_REQUESTS_PATH}, starting empty: {e}")
+    
+    _log_offset = _read_help_request_log(0)
+
+
+def _refresh_help_requests():
+    """Pick up requests that other job processes saved since this one last read the files"""
+    global _log_offset
+    # Another process compacted, so the JSON file was replaced and the log restarted
+    if _file_version(HELP_REQUESTS_PATH) != _json_version:
+        _load_help_requests()
+        return
+    log_version = _file_version(HELP_REQUESTS_LOG_PATH)
+    if log_version is None or log_version[2] < _log_offset:
+        _load_help_requests()
+    elif log_version[2] > _log_offset:
+        _log_offset = _read_help_request_log(_log_offset)
+
+
+def _compact_help_requests():
+    """Rewrite the JSON file from memory and start a fresh log"""
+    global _appends_since_compaction, _json_version, _log_offset
+    tmp_path = f"{HELP_REQUESTS_PATH}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(_requests_cache, option=orjson.OPT_INDENT_2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, HELP_REQUESTS_PATH)
+    
+    # Everything in the log is now in the JSON file. Truncate through the append
+    # handle rather than reopening, so other processes' appends land at the new end
+    _log_fh.truncate(0)
+    _appends_since_compaction = 0
+    _json_version = _file_version(HELP_REQUESTS_PATH)
+    _log_offset = 0
+    logger.info(f"Compacted help requests into {HELP_REQUESTS_PATH}")
 
 
 def save_help_request(request_id, question):
-    """Save a help request to the JSON file"""
+    """Save a help request, appending it to the log rather than rewriting the JSON file"""
+    global _log_fh
+    with _save_lock:
+        try:
+            if _log_fh is None:
+                _log_fh = open(HELP_REQUESTS_LOG_PATH, 'ab')
+            # Hold the log's lock while reading and writing, so processes take turns on the files
+            if fcntl is not None:
+                fcntl.flock(_log_fh, fcntl.LOCK_EX)
+        except OSError as e:
+            logger.error(f"Error opening help request log: {e}")
+            return request_id
+        try:
+            return _save_help_request_locked(request_id, question)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(_log_fh, fcntl.LOCK_UN)
+
+
+def _save_help_request_locked(request_id, question):
+    """Body of save_help_request, run while holding _save_lock and the log's file lock"""
+    global _appends_since_compaction, _log_offset
     try:
-        # Load existing requests
-        existing_requests = {}
-        if os.path.exists(HELP_REQUESTS_PATH):
-            try:
-                with open(HELP_REQUESTS_PATH, 'r') as f:
-                    existing_requests = json.load(f)
-            except json.JSONDecodeError:
-                existing_requests = {}
-        
-        # Ensure it's a dictionary
-        if not isinstance(existing_requests, dict):
-            existing_requests = {}
+        # Include requests other rooms saved, so their questions are not duplicated either
+        _refresh_help_requests()
         
         # Check if this question already exists in any form
-        question_lower = question.lower().strip()
-        for req_id, req_data in existing_requests.items():
-            if req_data.get("question", "").lower().strip() == question_lower:
-                logger.info(f"Question already exists as request {req_id}, not creating duplicate")
-                return req_id
+        question_key = _canon(question)
+        existing_id = _question_index.get(question_key)
+        if existing_id is not None:
+            logger.info(f"Question already exists as request {existing_id}, not creating duplicate")
+            return existing_id
         
         # Add the new request
-        existing_requests[request_id] = {
+        entry = {
             "question": question,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _fast_isoformat(),
             "status": "pending"
         }
+        _requests_cache[request_id] = entry
+        _question_index[question_key] = request_id
         
-        # Save back to file
-        with open(HELP_REQUESTS_PATH, 'w') as f:
-            json.dump(existing_requests, f, indent=2)
+        # Append it to the log
+        _log_fh.write(orjson.dumps({request_id: entry}) + b"\n")
+        _log_fh.flush()
+        os.fsync(_log_fh.fileno())
+        _appends_since_compaction += 1
+        _log_offset = _log_fh.tell()
         
-        logger.info(f"Saved help request {request_id} to file: {HELP_REQUESTS_PATH}")
+        if _appends_since_compaction >= COMPACT_EVERY_APPENDS:
+            _compact_help_requests()
+        
+        logger.info(f"Saved help request {request_id} to log: {HELP_REQUESTS_LOG_PATH}")
         return request_id
     except Exception as e:
         logger.error(f"Error saving help request to file: {e}")
         return request_id
 
 
+# Load saved help requests once, so saving never has to read the file
+_load_help_requests()
+
+
 class SalonAssistant(Agent):
     def __init__(self) -> None:
         super().__init__(
-            instructions=(
-                "You are a salon receptionist voice AI agent named Salon Assistant. Follow these guidelines:\n\n"
-                "1. IMMEDIATELY GREET CUSTOMERS when they join with a warm, friendly welcome.\n\n"
-                "2. NEVER use your own knowledge to answer questions about salon services, pricing, or appointments.\n\n"
-                "3. USE THE QUERY_KNOWLEDGE_BASE TOOL for ALL customer inquiries about:\n"
-                "   - Services (haircuts, coloring, styling, treatments)\n"
-                "   - Pricing information\n"
-                "   - Availability/appointments\n"
-                "   - Salon policies\n"
-                "   - Product recommendations\n"
-                "   - Bridal services\n"
-                "   - Spa services\n\n"
-                "4. IMMEDIATELY use the create_help_request tool when:\n"
-                "   - query_knowledge_base returns status 'escalated'\n"
-                "   - ANY questions about payments, especially international payments\n"
-                "   - Questions about currencies or payment methods\n"
-                "   - ANY question you don't have a direct answer for\n\n"
-                "5. When creating a help request:\n"
-                "   - Tell the customer you're checking with a supervisor\n"
-                "   - Provide the request ID and estimated response time\n"
-                "   - Reassure them that you'll notify them when you get an answer\n\n"
-                "6. When the customer SPECIFICALLY ASKS to check with a supervisor:\n"
-                "   - ALWAYS use the CREATE_HELP_REQUEST tool to submit their question\n"
-                "   - Tell them you've sent their question to the supervisor\n"
-                "   - Provide a request ID and estimated response time\n\n"
-                "7. Maintain a NATURAL CONVERSATIONAL TONE:\n"
-                "   - Be attentive and responsive\n"
-                "   - Avoid robotic-sounding phrases\n"
-                "   - Use casual, friendly language\n"
-                "   - Acknowledge and validate customer concerns\n\n"
-                "IMPORTANT: ALWAYS KEEP THE CONVERSATION GOING. If you don't know an answer, apologize, "
-                "explain you need to check with a supervisor, and suggest they can ask about other topics.\n\n"
-                "CRITICAL: For payment-related questions about international payments, credit cards, currencies, etc., "
-                "ALWAYS use query_knowledge_base and then create_help_request in sequence. NEVER skip creating a help request."
-            ),
+            instructions=_SALON_INSTRUCTIONS,
             tools=[]  # We'll add tools via decorators
         )
         self._agent_session = None  # Using a different name to avoid conflict
         self._websocket = None
-        self._pending_requests = {}  # Store pending requests by ID
+        self._pending_requests = OrderedDict()  # Store pending requests by ID, oldest first
+        self._handled_requests = OrderedDict()  # IDs of resolved requests already spoken, oldest first
         self._room_id = None
-        self._recently_escalated = {}  # Track recently escalated questions to avoid duplicates
+        self._recently_escalated = OrderedDict()  # Escalation key -> time escalated, to avoid duplicates
+        self._escalation_heap = []  # (expiry time, escalation key), soonest first
+        self._shingle_index = {}  # Shingle -> escalation keys containing it
+        self._http_session = None  # Shared aiohttp session, created on first use
+        self._closed = False  # Set by aclose; no new HTTP session is created after it
+        self._delivery_timers = {}  # Request ID -> timer that will notify the API of delivery
+        self._tts_queue = asyncio.Queue()  # Resolved answers waiting to be spoken, in arrival order
+        self._tts_task = None
+        self._websocket_task = None
+        self._clear_resolved_url = None  # Room-specific prefix, set with the session
         logger.info("Salon Assistant Initialized")
     
+    def _remember_request(self, request_id, request_data):
+        """Store a pending request, dropping the oldest beyond MAX_PENDING_REQUESTS"""
+        self._pending_requests[request_id] = request_data
+        self._pending_requests.move_to_end(request_id)
+        while len(self._pending_requests) > MAX_PENDING_REQUESTS:
+            self._pending_requests.popitem(last=False)
+    
+    def _mark_handled(self, request_id):
+        """Remember that a resolved request was spoken, so replays don't repeat it"""
+        self._handled_requests[request_id] = None
+        self._handled_requests.move_to_end(request_id)
+        while len(self._handled_requests) > MAX_HANDLED_REQUESTS:
+            self._handled_requests.popitem(last=False)
+    
+    def _http(self):
+        """Return the shared HTTP session, creating it inside the running event loop"""
+        if self._closed:
+            raise RuntimeError("HTTP session used after the assistant was closed")
+        if self._http_session is None or self._http_session.closed:
+            # A few keep-alive connections to the API are plenty for one room
+            self._http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+            )
+        return self._http_session
+    
+    def _encode_call_body(self, question):
+        """Encode the /call request body for a question once, with orjson"""
+        return orjson.dumps({
+            "question": question.strip(),
+            "caller_info": self._room_id or "room-unknown",
+            "require_supervisor": True
+        })
+    
+    async def aclose(self):
+        """Stop background tasks and close the HTTP session when the job shuts down"""
+        self._closed = True
+        for timer in self._delivery_timers.values():
+            timer.cancel()
+        self._delivery_timers.clear()
+        for task in (self._tts_task, self._websocket_task):
+            if task is not None:
+                task.cancel()
+        if self._http_session is not None:
+            await self._http_session.close()
+    
     def set_agent_session(self, session, room_id):
         """Set the agent session and room ID for WebSocket connection"""
         self._agent_session = session
         self._room_id = room_id
+        self._clear_resolved_url = f"{API_URL}/clear-resolved/{room_id}/"
+        # Speak resolved answers one at a time, without holding up the WebSocket loop
+        self._tts_task = asyncio.create_task(self._tts_consumer())
         # Start WebSocket client in background
-        asyncio.create_task(self._start_websocket_client())
+        self._websocket_task = asyncio.create_task(self._start_websocket_client())
         logger.info(f"Session set with room ID: {room_id}")
     
     async def _start_websocket_client(self):
@@ -151,25 +496,30 @@ class SalonAssistant(Agent):
         while retry_count < max_retries:
             try:
                 logger.info(f"Connecting to WebSocket at {ws_url}")
-                async with websockets.connect(ws_url) as websocket:
+                # Frames are small JSON messages, so compression only adds overhead.
+                # Replay frames can batch many requests, so allow up to 1 MiB
+                async with websocket_connect(ws_url, compression=None, max_size=WS_MAX_FRAME_BYTES) as websocket:
                     self._websocket = websocket
                     logger.info(f"WebSocket connected for room {self._room_id}")
                     
                     # Main message loop
                     while True:
                         try:
-                            message = await websocket.recv()
-                            data = json.loads(message)
-                            logger.info(f"Received WebSocket message: {data}")
-                            
-                            if data.get("type") == "request_resolved":
-                                # Handle resolved request
-                                await self._handle_resolved_request(data)
-                            elif data.get("type") == "ping":
-                                # Respond to ping
-                                await websocket.send(json.dumps({"type": "pong"}))
-                        except json.JSONDecodeError:
+                            # Take the raw bytes; orjson parses them without decoding to str first
+                            message = await websocket.recv(decode=False)
+                            payload = orjson.loads(message)
+                            # Notifications may arrive batched as a list of messages
+                            for data in (payload if isinstance(payload, list) else [payload]):
+                                logger.info(f"Received WebSocket message: {data}")
+                                
+                                if data.get("type") == "request_resolved":
+                                    # Handle resolved request
+                                    await self._handle_resolved_request(data)
+                        except orjson.JSONDecodeError:
                             logger.warning(f"Received non-JSON message: {message}")
+                        except websockets.exceptions.ConnectionClosed:
+                            # Leave the loop so the connection is retried
+                            raise
                         except Exception as e:
                             logger.error(f"Error processing WebSocket message: {e}")
                 
@@ -203,24 +553,35 @@ class SalonAssistant(Agent):
         
         logger.info(f"Handling resolved request {request_id}: Q: '{question}', A: '{answer}'")
         
-        # Check if we've already handled this request
-        if request_id in self._pending_requests and self._pending_requests[request_id].get("handled", False):
+        # Check if we've already handled (or queued) this request
+        if request_id in self._handled_requests or self._pending_requests.get(request_id, {}).get("status") == "resolved":
             logger.info(f"Request {request_id} already handled, skipping")
             return
         
         # Store the request details
-        self._pending_requests[request_id] = {
+        self._remember_request(request_id, {
             "question": question,
             "answer": answer,
-            "status": "resolved",
-            "handled": False
-        }
+            "status": "resolved"
+        })
         
-        # Add a small delay before speaking to ensure the system is ready
-        await asyncio.sleep(1)
-        
-        # Speak the answer to the user
-        await self._speak_resolved_answer(request_id, question, answer)
+        # Hand the answer to the speaking task and get back to the WebSocket
+        await self._tts_queue.put((request_id, question, answer))
+    
+    async def _tts_consumer(self):
+        """Speak queued resolved answers one after another"""
+        while True:
+            request_id, question, answer = await self._tts_queue.get()
+            try:
+                # Add a small delay before speaking to ensure the system is ready
+                await asyncio.sleep(1)
+                
+                # Speak the answer to the user
+                await self._speak_resolved_answer(request_id, question, answer)
+            except Exception as e:
+                logger.error(f"Error speaking resolved answer for request {request_id}: {e}")
+            finally:
+                self._tts_queue.task_done()
     
     async def _speak_resolved_answer(self, request_id, question, answer):
         """Speak the resolved answer to the user with multiple fallback mechanisms"""
@@ -228,83 +589,58 @@ class SalonAssistant(Agent):
             logger.error(f"Cannot speak answer for request {request_id}: No active session")
             return
         
-        # Prepare the message to acknowledge the resolved request
-        message = (
-            f"I just received an answer to your question about {question}. "
-            f"The answer is: {answer} "
-            f"Is there anything else you'd like to know about our salon services?"
-        )
-        
-        # Track if any method succeeds
-        success = False
-        
-        # Method 1: Use say directly (most direct approach)
-        try:
-            logger.info(f"First attempt: Speaking answer for request {request_id} using say")
-            await self._agent_session.say(message)
-            success = True
-            logger.info(f"Successfully spoke answer using say method")
-        except Exception as e:
-            logger.error(f"Error using say method for request {request_id}: {e}")
-        
-        # Method 2: If first method failed, use generate_reply with wait
-        if not success:
-            try:
-                logger.info(f"Second attempt: Speaking answer using generate_reply with delay")
-                await asyncio.sleep(2)  # Pause to ensure any previous speech is complete
-                
-                # Use shorter message to reduce chance of TTS issues
-                short_message = f"About your question on {question}: {answer}"
-                await self._agent_session.generate_reply(
-                    instructions=f"Speak only this exact message to the user: {short_message}"
-                )
-                success = True
-                logger.info(f"Successfully spoke answer using generate_reply method")
-            except Exception as e:
-                logger.error(f"Error using generate_reply for request {request_id}: {e}")
-        
-        # Method 3: Try a different format
-        if not success:
-            try:
-                logger.info(f"Third attempt: Breaking message into smaller chunks")
-                await asyncio.sleep(3)  # Longer pause
-                
-                # Break into smaller chunks
-                await self._agent_session.say(f"I have an answer to your question.")
-                await asyncio.sleep(1)
-                await self._agent_session.say(f"Regarding {question}, the answer is: {answer}")
-                
-                success = True
-                logger.info(f"Successfully spoke answer in chunks")
-            except Exception as e:
-                logger.error(f"Error speaking in chunks for request {request_id}: {e}")
-        
-        # Method 4: Final fallback attempt with simpler text
-        if not success:
+        # Try each way of speaking in turn until one works
+        values = {"question": question, "answer": answer}
+        for attempt, (pause, method_name, template) in enumerate(_SPEAK_STRATEGIES, 1):
             try:
-                logger.info(f"Final attempt: Using simplest possible method")
-                await asyncio.sleep(4)  # Even longer pause
-                
-                # Use the most basic message possible
-                await self._agent_session.say(f"The answer to your question is: {answer}")
-                
-                success = True
-                logger.info(f"Successfully delivered answer using final fallback")
+                if pause:
+                    await asyncio.sleep(pause)  # Pause to ensure any previous speech is complete
+                logger.info(f"Attempt {attempt}: Speaking answer for request {request_id} using {method_name}")
+                await getattr(self, method_name)(template.format_map(values))
+                logger.info(f"Successfully spoke answer for request {request_id} using {method_name}")
+                break
             except Exception as e:
-                logger.error(f"All speech attempts failed for request {request_id}: {e}")
+                logger.error(f"Error using {method_name} for request {request_id}: {e}")
+        else:
+            logger.error(f"All speech attempts failed for request {request_id}")
         
         # Even if we failed to speak, mark as handled so we don't try again
-        self._pending_requests[request_id]["handled"] = True
+        self._mark_handled(request_id)
         
-        # Set up a delayed notification to the API
+        # Set up a delayed notification to the API on the event loop's timer
         # This gives time for TTS to complete before clearing the request
-        def delayed_notification():
-            asyncio.create_task(self._notify_answer_delivered(request_id))
-        
-        # Run the notification after a delay to ensure TTS completes
-        Timer(3.0, delayed_notification).start()
+        previous = self._delivery_timers.pop(request_id, None)
+        if previous is not None:
+            previous.cancel()
+        self._delivery_timers[request_id] = asyncio.get_running_loop().call_later(
+            3.0, self._start_delivery_notice, request_id
+        )
         logger.info(f"Set up delayed notification for request {request_id}")
     
+    async def _say(self, message):
+        """Speak a message directly"""
+        await asyncio.wait_for(self._agent_session.say(message), SPEAK_TIMEOUT_SECONDS)
+    
+    async def _reply(self, message):
+        """Have the LLM speak a message verbatim"""
+        await asyncio.wait_for(
+            self._agent_session.generate_reply(
+                instructions=f"Speak only this exact message to the user: {message}"
+            ),
+            SPEAK_TIMEOUT_SECONDS
+        )
+    
+    async def _say_in_chunks(self, message):
+        """Announce that an answer arrived, then speak it"""
+        await self._say("I have an answer to your question.")
+        await asyncio.sleep(1)
+        await self._say(message)
+    
+    def _start_delivery_notice(self, request_id):
+        """Timer callback that starts notifying the API of a delivered answer"""
+        self._delivery_timers.pop(request_id, None)
+        asyncio.create_task(self._notify_answer_delivered(request_id))
+    
     async def _notify_answer_delivered(self, request_id):
         """Notify the API that the answer was delivered to the user"""
         try:
@@ -314,101 +650,141 @@ class SalonAssistant(Agent):
                 return
             
             # Call the API to mark the request as delivered
-            response = requests.delete(
-                f"{API_URL}/clear-resolved/{self._room_id}/{request_id}",
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Successfully notified API that request {request_id} was delivered")
-                
-                # Mark the request as notified to prevent duplicate notifications
-                self._pending_requests[request_id]["notified"] = True
-            else:
-                logger.warning(f"Failed to notify API about delivered request {request_id}: {response.status_code}")
+            async with self._http().delete(f"{self._clear_resolved_url}{request_id}") as response:
+                if response.status == 200:
+                    logger.info(f"Successfully notified API that request {request_id} was delivered")
+                    
+                    # Nothing more to do for this request; _handled_requests stops repeats
+                    self._pending_requests.pop(request_id, None)
+                else:
+                    logger.warning(f"Failed to notify API about delivered request {request_id}: {response.status}")
         except Exception as e:
             logger.error(f"Error notifying API about delivered request {request_id}: {e}")
     
+    def _expire_escalations(self):
+        """Forget escalations older than the TTL, soonest expiry first"""
+        now = time.time()
+        heap = self._escalation_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            escalated_at = self._recently_escalated.get(key)
+            # Skip stale heap entries for questions escalated again since
+            if escalated_at is None or escalated_at + ESCALATION_TTL_SECONDS != expires_at:
+                continue
+            del self._recently_escalated[key]
+            for shingle in _shingles(key):
+                keys = self._shingle_index.get(shingle)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._shingle_index[shingle]
+    
+    def _mark_escalated(self, question):
+        """Remember that a question was just escalated"""
+        key = _escalation_key(question)
+        escalated_at = time.time()
+        self._recently_escalated[key] = escalated_at
+        self._recently_escalated.move_to_end(key)
+        heapq.heappush(self._escalation_heap, (escalated_at + ESCALATION_TTL_SECONDS, key))
+        for shingle in _shingles(key):
+            self._shingle_index.setdefault(shingle, set()).add(key)
+    
     def _question_recently_escalated(self, question):
         """Check if a question was recently escalated to avoid duplicates"""
-        question_lower = question.lower().strip()
-        
-        # Clean up old entries (older than 5 minutes)
-        current_time = time.time()
-        for q in list(self._recently_escalated.keys()):
-            if current_time - self._recently_escalated[q] > 300:  # 5 minutes
-                del self._recently_escalated[q]
-        
-        # Check if this question or a similar one was recently escalated
-        for q in self._recently_escalated:
-            if question_lower in q or q in question_lower:
+        self._expire_escalations()
+        
+        key = _escalation_key(question)
+        if key in self._recently_escalated:
+            return True
+        
+        # Similar questions share shingles; count overlaps per escalated key
+        question_shingles = _shingles(key)
+        overlaps = {}
+        for shingle in question_shingles:
+            for other in self._shingle_index.get(shingle, ()):
+                overlaps[other] = overlaps.get(other, 0) + 1
+        for other, shared in overlaps.items():
+            # Two shared shingles, or every shingle of the shorter question
+            if shared >= min(2, len(question_shingles), len(_shingles(other))):
                 return True
         
         return False
     
+    async def _escalate(self, question):
+        """
+        Create a help request for a question once: save it, send it to the API and remember it.
+        Both escalation tools go through here, so a question is never written or posted twice.
+        
+        Returns:
+            The response for the LLM, and whether a new help request was created
+        """
+        # Check if this question was recently escalated
+        if self._question_recently_escalated(question):
+            logger.info(f"Question '{question}' was recently escalated, skipping duplicate")
+            # Return the same style of response, but don't actually create a new request
+            return {
+                "status": "escalated",
+                "help_request_id": "pending",
+                "estimated_time": "5-10 minutes", 
+                "response": _ALREADY_ESCALATED_MESSAGE.format_map({"question": question})
+            }, False
+        
+        # Mark as recently escalated
+        self._mark_escalated(question)
+        
+        # Generate a unique request ID
+        request_id = _next_request_id()
+        
+        # Save help request to file, off the event loop
+        request_id = await asyncio.to_thread(save_help_request, request_id, question)
+        
+        try:
+            logger.info(f"Sending help request to API at {CALL_URL}")
+            async with self._http().post(
+                CALL_URL,
+                data=self._encode_call_body(question),
+                headers=_JSON_HEADERS
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if "help_request_id" in data:
+                        request_id = data["help_request_id"]  # Use API-generated ID
+                    logger.info(f"Help request created with ID: {request_id}")
+                else:
+                    logger.warning(f"API returned non-200 status: {response.status}")
+        except Exception as e:
+            logger.error(f"Error sending help request to API: {e}")
+        
+        # Store in memory
+        self._remember_request(request_id, {
+            "question": question,
+            "status": "pending",
+            "created_at": _fast_isoformat()
+        })
+        
+        return {
+            "status": "escalated",
+            "help_request_id": request_id,
+            "estimated_time": "5-10 minutes", 
+            "response": _ESCALATED_MESSAGE.format_map({"question": question, "request_id": request_id})
+        }, True
+    
     async def handle_escalated_question(self, question):
         """
         Handle an escalated question by creating a help request and notifying the user.
         This is called manually when needed, bypassing the LLM decision process.
         """
         try:
-            # Check if this question was recently escalated
-            if self._question_recently_escalated(question):
-                logger.info(f"Question '{question}' was recently escalated, skipping duplicate")
+            result, created = await self._escalate(question)
+            if not created:
                 return None
             
-            # Mark as recently escalated
-            self._recently_escalated[question.lower().strip()] = time.time()
-            
-            # Generate request ID
-            request_id = str(uuid.uuid4())[:8]
-            
-            # Save help request to file directly
-            save_help_request(request_id, question)
-            
-            # Try API call
-            room_id = self._room_id or "room-unknown"
-            
-            try:
-                # Call the API
-                response = requests.post(
-                    f"{API_URL}/call",
-                    json={
-                        "question": question.strip(),
-                        "caller_info": room_id,
-                        "require_supervisor": True
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if "help_request_id" in data:
-                        request_id = data["help_request_id"]  # Use API-generated ID
-                        logger.info(f"Help request created via API with ID: {request_id}")
-            except Exception as e:
-                logger.error(f"Error sending help request to API: {e}")
-            
-            # Store in memory
-            self._pending_requests[request_id] = {
-                "question": question,
-                "status": "pending",
-                "created_at": datetime.now().isoformat()
-            }
-            
             # Tell the user about the escalation
-            message = (
-                f"I've sent your question about {question} to my supervisor. "
-                f"Your request ID is {request_id}. They usually respond within 5-10 minutes. "
-                f"I'll let you know as soon as I hear back. "
-                f"Is there anything else I can help you with in the meantime?"
-            )
-            
+            request_id = result["help_request_id"]
             if self._agent_session:
                 logger.info(f"Informing user about escalation with request ID: {request_id}")
                 await self._agent_session.generate_reply(
-                    instructions=f"Speak this exact message to the user: {message}"
+                    instructions=f"Speak this exact message to the user: {result['response']}"
                 )
             
             return request_id
@@ -457,12 +833,7 @@ class SalonAssistant(Agent):
             return {
                 "status": "escalated",
                 "question": question,  # Include the original question for easier reference
-                "response": (
-                    f"I don't have information about {question} in my knowledge base yet. "
-                    f"I'd need to check with my supervisor about this specific question. "
-                    f"In the meantime, is there anything else I can help you with about our services, "
-                    f"pricing, or appointment availability?"
-                )
+                "response": _UNKNOWN_QUESTION_MESSAGE.format_map({"question": question})
             }
     
     @function_tool()
@@ -484,75 +855,9 @@ class SalonAssistant(Agent):
         """
         logger.info(f"Creating help request for: '{question}'")
         
-        # Check if this question was recently escalated
-        if self._question_recently_escalated(question):
-            logger.info(f"Question '{question}' was recently escalated via another method, skipping duplicate")
-            # Return the same style of response, but don't actually create a new request
-            return {
-                "status": "escalated",
-                "help_request_id": "pending",
-                "estimated_time": "5-10 minutes", 
-                "response": (
-                    f"I've already sent your question about {question} to my supervisor. "
-                    f"They usually respond within 5-10 minutes. "
-                    f"I'll let you know as soon as I hear back. "
-                    f"Is there anything else I can help you with in the meantime?"
-                )
-            }
-        
-        # Mark as recently escalated
-        self._recently_escalated[question.lower().strip()] = time.time()
-        
-        # Generate a unique request ID
-        request_id = str(uuid.uuid4())[:8]
-        
-        # Save help request to file
-        request_id = save_help_request(request_id, question)
-        
-        # Use the room_id from the session if available
-        room_id = self._room_id or "room-unknown"
-        
-        try:
-            logger.info(f"Sending help request to API at {API_URL}/call")
-            response = requests.post(
-                f"{API_URL}/call",
-                json={
-                    "question": question.strip(),
-                    "caller_info": room_id,
-                    "require_supervisor": True
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "help_request_id" in data:
-                    request_id = data["help_request_id"]
-                logger.info(f"Help request created with ID: {request_id}")
-                
-                # Add to pending requests
-                self._pending_requests[request_id] = {
-                    "question": question,
-                    "status": "pending",
-                    "created_at": datetime.now().isoformat()
-                }
-            else:
-                logger.warning(f"API returned non-200 status: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Error sending help request to API: {e}")
-        
-        return {
-            "status": "escalated",
-            "help_request_id": request_id,
-            "estimated_time": "5-10 minutes", 
-            "response": (
-                f"I've sent your question about {question} to my supervisor. "
-                f"Your request ID is {request_id}. They usually respond within 5-10 minutes. "
-                f"I'll let you know as soon as I hear back. "
-                f"Is there anything else I can help you with in the meantime?"
-            )
-        }
+        # Shares one path with query_knowledge_base, so a question already escalated there is not sent again
+        result, _ = await self._escalate(question)
+        return result
     
     def _check_local_knowledge(self, question: str) -> str:
         """
@@ -567,43 +872,50 @@ class SalonAssistant(Agent):
         # Convert question to lowercase for easier matching
         question_lower = question.lower()
         
+        # Try an exact match first (with and without question mark)
+        clean_question = question_lower.rstrip('?').strip()
+        answer = _EXACT_MATCHES.get(clean_question)
+        if answer is not None:
+            return answer
+        
+        # Categories of every keyword in the question, found in a single pass
+        categories = {_KEYWORD_CATEGORIES[match] for match in _KEYWORD_PATTERN.findall(question_lower)}
+        
         # Check for services questions
-        if any(keyword in question_lower for keyword in ["haircut", "cut", "trim", "style"]):
-            if "price" in question_lower or "cost" in question_lower:
-                if "women" in question_lower:
+        if "haircut" in categories:
+            if "price" in categories:
+                if "women" in categories:
                     return "Our women's haircuts start at $45, depending on hair length and styling needs."
-                elif "men" in question_lower:
+                elif "men" in categories:
                     return "Men's haircuts start at $30, including a wash and style."
-                elif "child" in question_lower or "kid" in question_lower:
+                elif "child" in categories:
                     return "Children's haircuts (12 and under) start at $25."
                 else:
                     return "Our haircuts start at $30 for men, $45 for women, and $25 for children. The final price depends on hair length and styling needs."
             else:
                 return "Yes, we offer haircut services for men, women, and children. Our stylists are experienced in various cutting techniques and styles."
         
-        # Keep the rest of your knowledge checks...
-        
-        # Check exact matches or key phrases from the API knowledge base
-        exact_matches = {
-            "do you have bridal makeup services": "Yes We have bridal makeup services",
-            "do you have spa services": "Yes, we provide a variety of spa treatments including massages and facials.",
-            "do you have hair dressing cutting services": "Yes, we offer professional hair cutting and styling services.",
-            "do you have party makeup": "Yes we provide party make up",
-            "do you offer hair bleaching": "Yes we offer different colors of hair bleaching",
-            "do you have makeup services": "Yes, we provide all kinds of makeup services from facial, tanning to every other makeup service",
-            "do you offer bridal makeup": "Yes we do offer bridal makeup",
-            "do you offer back or hair removal service in your salon": "Yes we do offer waxing and hair removal at our salon"
-        }
-        
-        # Try to match question (with and without question mark)
-        clean_question = question_lower.rstrip('?').strip()
-        if clean_question in exact_matches:
-            return exact_matches[clean_question]
-        
         # If no matches found
         return None
 
 
+# Models used by every session
+STT_MODEL = "nova-3"
+LLM_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+TTS_MODEL = "aura-2-athena-en"
+
+
+@lru_cache(maxsize=1)
+def _get_vad():
+    """Load the Silero VAD model once per process; sessions share it"""
+    return silero.VAD.load()
+
+
+def prewarm(proc: JobProcess):
+    """Load the VAD before the worker process is given its first job"""
+    _get_vad()
+
+
 async def entrypoint(ctx: agents.JobContext):
     # Connect to the LiveKit room
     await ctx.connect()
@@ -613,8 +925,8 @@ async def entrypoint(ctx: agents.JobContext):
     # Create help_requests.json file if it doesn't exist
     if not os.path.exists(HELP_REQUESTS_PATH):
         try:
-            with open(HELP_REQUESTS_PATH, 'w') as f:
-                json.dump({}, f)
+            with open(HELP_REQUESTS_PATH, 'wb') as f:
+                f.write(orjson.dumps({}))
                 logger.info(f"Created empty help_requests.json file at {HELP_REQUESTS_PATH}")
         except Exception as e:
             logger.error(f"Error creating help_requests.json: {e}")
@@ -625,17 +937,17 @@ async def entrypoint(ctx: agents.JobContext):
     # Initialize agent session
     session = AgentSession(
         # Speech to text
-        stt=deepgram.STT(model="nova-3", language="en"),
+        stt=deepgram.STT(model=STT_MODEL, language="en"),
         
         # Language model 
-        llm=groq.LLM(model="meta-llama/llama-4-maverick-17b-128e-instruct"),
+        llm=groq.LLM(model=LLM_MODEL),
         
         # Text to speech
         tts=deepgram.TTS(
-            model="aura-2-athena-en",
+            model=TTS_MODEL,
         ),
         # Voice activity detection
-        vad=silero.VAD.load(),
+        vad=_get_vad(),
         
         # Turn detection
         turn_detection=MultilingualModel(),
@@ -653,6 +965,8 @@ async def entrypoint(ctx: agents.JobContext):
     
     # Set the session in the agent AFTER starting the session
     salon_assistant.set_agent_session(session, room_name)
+    # Release the agent's HTTP connections and tasks when the job ends
+    ctx.add_shutdown_callback(salon_assistant.aclose)
     
     # Send an immediate greeting
     try:
@@ -691,4 +1005,4 @@ async def entrypoint(ctx: agents.JobContext):
         logger.error(f"Error sending critical instructions: {e}")
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file